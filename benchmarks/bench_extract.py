@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Бенчмарк извлечения текста песни из сохранённых HTML-страниц Genius.
+
+Сравнивает прежний путь (полное дерево BeautifulSoup html.parser и
+эвристики _extract_lyrics) с быстрым разбором через lxml.
+
+    python benchmarks/bench_extract.py [--repeat 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from genius_scraper import GeniusScraper  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures')
+
+
+def legacy_parse(scraper, content):
+    """Прежний разбор страницы: html.parser и эвристики по всему дереву"""
+    soup = BeautifulSoup(content, 'html.parser')
+    title_element = soup.find('h1')
+    title = title_element.get_text().strip() if title_element else None
+    return title, scraper._extract_lyrics(soup)
+
+
+def fast_parse(scraper, content):
+    """Текущий разбор страницы"""
+    result, _ = scraper._parse_song_page(content, 'https://genius.com/fixture')
+    return result
+
+
+def measure(func, repeat):
+    """Лучшее и среднее время вызова в миллисекундах"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings), sum(timings) / len(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    scraper = GeniusScraper()
+    print(f"{'fixture':<24}{'size':>9}{'legacy best/avg, ms':>24}{'fast best/avg, ms':>22}{'speedup':>9}")
+    for name in sorted(os.listdir(FIXTURES)):
+        if not (name.startswith('song_') and name.endswith('.html')):
+            continue
+        with open(os.path.join(FIXTURES, name), 'rb') as f:
+            content = f.read()
+
+        legacy_best, legacy_avg = measure(lambda: legacy_parse(scraper, content), args.repeat)
+        fast_best, fast_avg = measure(lambda: fast_parse(scraper, content), args.repeat)
+        print(
+            f"{name:<24}{len(content) // 1024:>7}KB"
+            f"{legacy_best:>13.2f} /{legacy_avg:>8.2f}"
+            f"{fast_best:>12.2f} /{fast_avg:>8.2f}"
+            f"{legacy_avg / fast_avg:>8.1f}x"
+        )
+
+
+if __name__ == '__main__':
+    main()
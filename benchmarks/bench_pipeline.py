@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Офлайн-бенчмарк конвейера поиск -> извлечение -> перевод -> разбивка.
+
+Сеть заменена локальной подставкой (httpx.MockTransport): Genius отвечает
+сохранёнными фикстурами, сервис перевода - поддельным переводом с
+настраиваемой задержкой. Для каждой стадии печатаются p50/p99, пропускная
+способность и пик выделенной памяти.
+
+    python benchmarks/bench_pipeline.py [--repeat 30] [--concurrency 20]
+    python benchmarks/bench_pipeline.py --json > baseline.json
+    python benchmarks/bench_pipeline.py --baseline baseline.json --tolerance 0.25
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bot  # noqa: E402
+import translate  # noqa: E402
+from genius_scraper import AsyncGeniusScraper  # noqa: E402
+from message_builder import MessageParts, line_block, title_header  # noqa: E402
+from song_index import SongIndex  # noqa: E402
+from translation_cache import TranslationCache  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures')
+QUERY = "amazing grace john newton"
+SONG_URL = "https://genius.com/John-newton-amazing-grace-lyrics"
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+class FakeUpstream:
+    """Локальная подставка для Genius и сервисов перевода"""
+
+    def __init__(self, genius_latency, translate_latency):
+        self.genius_latency = genius_latency
+        self.translate_latency = translate_latency
+        self.api_search = read_fixture('api_search.json')
+        self.search_page = read_fixture('search_page.html')
+        self.song_page = read_fixture('song_containers.html')
+        self.requests = 0
+
+    async def handle(self, request):
+        self.requests += 1
+        host, path = request.url.host, request.url.path
+        if host == 'translate.googleapis.com':
+            await asyncio.sleep(self.translate_latency)
+            text = request.url.params['q']
+            # Формат ответа Google: по сегменту на строку
+            segments = [[line.upper() + "\n", line + "\n"] for line in text.split("\n")]
+            segments[-1][0] = segments[-1][0].rstrip("\n")
+            return httpx.Response(200, json=[segments, None, "en"])
+        if host == 'api.mymemory.translated.net':
+            await asyncio.sleep(self.translate_latency)
+            return httpx.Response(429)
+
+        await asyncio.sleep(self.genius_latency)
+        if path == '/api/search/multi':
+            return httpx.Response(200, content=self.api_search, headers={'Content-Type': 'application/json'})
+        if path == '/search':
+            return httpx.Response(200, content=self.search_page)
+        if path.endswith('-lyrics'):
+            return httpx.Response(200, content=self.song_page)
+        return httpx.Response(404)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def fresh_scraper(client):
+    """Скрапер без прогретых кэшей и без файла индекса"""
+    scraper = AsyncGeniusScraper(client=client)
+    scraper.song_index = SongIndex(path='')
+    return scraper
+
+
+def fresh_translation_cache():
+    translate.translation_cache = TranslationCache(path='')
+
+
+async def run_stage(func, repeat, concurrency):
+    """Задержки отдельных вызовов (мс), пропускная способность и пик памяти"""
+    timings = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await func()
+            timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(repeat)))
+    elapsed = time.perf_counter() - started
+
+    # Память меряем отдельным прогоном: tracemalloc сильно замедляет код
+    tracemalloc.start()
+    await func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'p50_ms': percentile(timings, 0.5),
+        'p99_ms': percentile(timings, 0.99),
+        'throughput_per_s': repeat / elapsed,
+        'peak_kb': peak / 1024,
+    }
+
+
+async def benchmark(args):
+    upstream = FakeUpstream(args.genius_latency, args.translate_latency)
+    client = httpx.AsyncClient(transport=httpx.MockTransport(upstream.handle))
+    song_page = upstream.song_page
+
+    parser_scraper = fresh_scraper(client)
+    result, _ = parser_scraper._parse_song_page(song_page, SONG_URL)
+    lines = bot.song_lines(result['lyrics'])
+    blocks = [line_block(line, line.upper()) for line in lines]
+
+    async def search_song():
+        await fresh_scraper(client).search_song(QUERY)
+
+    async def get_lyrics():
+        await fresh_scraper(client).get_lyrics(SONG_URL)
+
+    async def extract_lyrics():
+        parser_scraper._parse_song_page(song_page, SONG_URL)
+
+    async def translate_text():
+        fresh_translation_cache()
+        await translate.translate_text_async(lines[1], client=client)
+
+    async def translate_batch():
+        fresh_translation_cache()
+        await translate.translate_batch_async(lines, client=client)
+
+    async def split_message():
+        parts = MessageParts(title_header(result['title']))
+        for _ in range(args.split_scale):
+            parts.extend(blocks)
+        parts.parts
+
+    async def end_to_end():
+        fresh_translation_cache()
+        found, _ = await fresh_scraper(client).search_song(QUERY)
+        song_lines = bot.song_lines(found['lyrics'])
+        bot.build_parts(found['title'], song_lines, await bot.translate_lines(song_lines))
+
+    # translate_lines в боте использует общий клиент - подменяем его
+    translate_batch_async = translate.translate_batch_async
+    bot.translate_batch_async = lambda batch: translate_batch_async(batch, client=client)
+
+    stages = [
+        ('search_song', search_song, args.concurrency),
+        ('get_lyrics', get_lyrics, args.concurrency),
+        ('extract_lyrics', extract_lyrics, 1),
+        ('translate_text', translate_text, args.concurrency),
+        ('translate_batch', translate_batch, args.concurrency),
+        ('split_message', split_message, 1),
+        ('end_to_end', end_to_end, args.concurrency),
+    ]
+    report = {}
+    for name, func, concurrency in stages:
+        report[name] = await run_stage(func, args.repeat, concurrency)
+    report['_upstream_requests'] = upstream.requests
+    await client.aclose()
+    return report
+
+
+def print_report(report):
+    print(f"{'stage':<18}{'p50, ms':>10}{'p99, ms':>10}{'ops/s':>10}{'peak, KB':>11}")
+    for name, stats in report.items():
+        if name.startswith('_'):
+            continue
+        print(
+            f"{name:<18}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+            f"{stats['throughput_per_s']:>10.1f}{stats['peak_kb']:>11.1f}"
+        )
+
+
+def compare(report, baseline, tolerance):
+    """Список регрессий p50/p99 относительно сохранённого отчёта"""
+    regressions = []
+    for name, stats in baseline.items():
+        if name.startswith('_') or name not in report:
+            continue
+        for metric in ('p50_ms', 'p99_ms'):
+            limit = stats[metric] * (1 + tolerance)
+            if report[name][metric] > limit:
+                regressions.append(f"{name}.{metric}: {report[name][metric]:.2f} > {limit:.2f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--genius-latency', type=float, default=0.02, help='задержка Genius, с')
+    parser.add_argument('--translate-latency', type=float, default=0.05, help='задержка перевода, с')
+    parser.add_argument('--split-scale', type=int, default=10, help='во сколько раз удлинить текст для разбивки')
+    parser.add_argument('--json', action='store_true', help='вывести отчёт в JSON')
+    parser.add_argument('--baseline', help='JSON-отчёт, с которым сравнивать')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='допустимое ухудшение (доля)')
+    args = parser.parse_args()
+
+    # Журнал httpx пишет строку на каждый запрос к подставке
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    report = asyncio.run(benchmark(args))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"РЕГРЕССИЯ {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,40 @@
+if __name__ == '__main__':
+    # .env читается только при запуске бота и до импорта config
+    from dotenv import load_dotenv
+    load_dotenv()
+
+import argparse
+import asyncio
+import hashlib
 import logging
-from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
-from genius_scraper import GeniusScraper
-from config import TELEGRAM_BOT_TOKEN
-from translate import translate_text
+import time
+from telegram import (
+    Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle,
+    InputTextMessageContent,
+)
+from telegram.error import BadRequest, RetryAfter
+from telegram.ext import (
+    Application, CommandHandler, MessageHandler, InlineQueryHandler, ChosenInlineResultHandler,
+    filters, ContextTypes,
+)
+from genius_scraper import AsyncGeniusScraper, NOT_FOUND_SEARCH, NOT_FOUND_LYRICS
+from config import (
+    TELEGRAM_BOT_TOKEN, CONCURRENT_UPDATES, STREAMING_REPLIES, STREAM_FIRST_LINES,
+    STREAM_BATCH_LINES, STREAM_EDIT_INTERVAL, METRICS_PORT, ADMIN_IDS, PER_USER_CONCURRENCY,
+    UPDATE_QUEUE_LIMIT, PER_USER_QUEUE_LIMIT, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_LISTEN, PORT,
+    WEBHOOK_MAX_CONNECTIONS, WARM_UP_INTERVAL, INLINE_RESULTS_LIMIT, INLINE_DEBOUNCE,
+    INLINE_CACHE_TIME, PRELOAD_CACHES,
+)
+from http_client import close_client, get_client
+import lyrics_extractor
+from lyrics_store import LyricsStore, warm_up_forever
+from message_builder import (
+    MessageParts, MAX_MESSAGE_LENGTH, html_text, line_block, title_header, utf16_length,
+)
+from metrics import REQUESTS, SEARCH_STRATEGY, STAGE_SECONDS, start_http_server
+import translate
+from translate import translate_batch_async
+from update_processor import FairUpdateProcessor
 
 # Настройка логирования
 logging.basicConfig(
@@ -13,7 +44,22 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Инициализация скрапера
-scraper = GeniusScraper()
+scraper = AsyncGeniusScraper()
+# Готовые ответы для популярных песен
+store = LyricsStore()
+
+# Типы обновлений, которые бот обрабатывает
+ALLOWED_UPDATES = [Update.MESSAGE, Update.INLINE_QUERY, Update.CHOSEN_INLINE_RESULT]
+
+GENIUS_URL = 'https://genius.com/'
+# Telegram ограничивает id inline-результата 64 байтами
+MAX_RESULT_ID = 64
+# Начало id-хэша слишком длинного URL (путь страницы Genius так не начинается)
+HASHED_RESULT_ID = '#'
+# Пользователь -> id его последнего inline-запроса (для отбрасывания устаревших)
+inline_latest = {}
+# Оценка подсказки индекса, при которой ответ не ждёт API
+STRONG_SUGGESTION = 0.9
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /start"""
@@ -55,6 +101,163 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     await update.message.reply_text(help_message)
 
+async def translate_lines(lines):
+    """Пакетный перевод строк: перевод каждой строки или None"""
+    # Переводим только строки длиннее 3 символов
+    to_translate = [i for i, line in enumerate(lines) if line and len(line) > 3]
+    try:
+        with STAGE_SECONDS.time(stage='translate'):
+            translations = await translate_batch_async([lines[i] for i in to_translate])
+    except Exception:
+        translations = []
+
+    result = [None] * len(lines)
+    for i, ru in zip(to_translate, translations):
+        if ru and ru != lines[i]:  # Если перевод успешен и отличается от оригинала
+            result[i] = ru
+    return result
+
+def song_lines(lyrics):
+    """Непустые строки текста песни"""
+    return [line for line in map(str.strip, lyrics.split('\n')) if line]
+
+def build_parts(title, lines, translations, max_length=MAX_MESSAGE_LENGTH):
+    """Части ответа: оригинал и перевод строк, разбитые по длине сообщения"""
+    return MessageParts(title_header(title), max_length).extend(map(line_block, lines, translations)).parts
+
+def song_record(result, lines, translated, parts):
+    """Запись для хранилища или None, если ни одна строка не переведена.
+
+    Неудачный перевод не сохраняется, чтобы не отдавать его из хранилища
+    до следующего прогрева.
+    """
+    if not any(translated):
+        return None
+    return {
+        'url': result['url'],
+        'title': result['title'],
+        'lines': lines,
+        'translated': translated,
+        'parts': parts,
+    }
+
+async def prepare_song(result):
+    """Полная обработка песни для хранилища: перевод и разбивка на части"""
+    lines = song_lines(result['lyrics'])
+    translated = await translate_lines(lines)
+    return song_record(result, lines, translated, build_parts(result['title'], lines, translated))
+
+async def stored_song(query):
+    """Готовый ответ из хранилища: по журналу запросов или локальному индексу"""
+    url = await asyncio.to_thread(store.url_for, query)
+    if url is None:
+        url = await asyncio.to_thread(scraper.song_index.lookup, query)
+    if url is None:
+        return None
+    return await asyncio.to_thread(store.get, url)
+
+def with_link(parts, url):
+    """Добавляет ссылку на песню: в единственную часть или отдельным сообщением"""
+    link = f"\n\n🔗 {html_text(url)}"
+    if len(parts) == 1 and utf16_length(parts[0]) + utf16_length(link) <= MAX_MESSAGE_LENGTH:
+        return [parts[0].rstrip('\n') + link], None
+    return parts, f"🔗 Полный текст: {url}"
+
+async def send_parts(message, parts, url):
+    """Отправляет готовые части ответа"""
+    parts, link_message = with_link(parts, url)
+    with STAGE_SECONDS.time(stage='send'):
+        for part in parts:
+            await message.reply_text(part, parse_mode='HTML')
+        if link_message:
+            await message.reply_text(link_message)
+
+async def stream_lyrics(message, title, url, lines):
+    """Прогрессивная отправка: части уходят по мере перевода.
+
+    Первый пакет строк небольшой, чтобы первое сообщение появилось быстро;
+    остальные пакеты переводятся параллельно и дописываются в открытое
+    сообщение (правкой не чаще STREAM_EDIT_INTERVAL) или в новые сообщения.
+    При флуд-контроле Telegram (RetryAfter) промежуточные правки открытой
+    части пропускаются, а закрытые части и итог ждут разрешённого момента.
+    Возвращает переводы строк и части сообщения (без ссылки).
+    """
+    batches = [lines[:STREAM_FIRST_LINES]]
+    for start in range(STREAM_FIRST_LINES, len(lines), STREAM_BATCH_LINES):
+        batches.append(lines[start:start + STREAM_BATCH_LINES])
+    tasks = [asyncio.ensure_future(translate_lines(batch)) for batch in batches]
+
+    parts = MessageParts(title_header(title))
+    translated = []
+    sent = []  # [(сообщение, текст)] уже отправленных частей
+    last_edit = 0.0
+    # До какого момента Telegram просил не отправлять сообщения в чат
+    flood_until = 0.0
+
+    async def call(request, wait):
+        """Запрос к Bot API с учётом флуд-контроля; None - пропущен без ожидания"""
+        nonlocal flood_until
+        while True:
+            delay = flood_until - time.monotonic()
+            if delay > 0:
+                if not wait:
+                    return None
+                await asyncio.sleep(delay)
+            try:
+                with STAGE_SECONDS.time(stage='send'):
+                    return await request()
+            except RetryAfter as e:
+                logger.warning(f"Флуд-контроль Telegram: пауза {e.retry_after} с")
+                flood_until = time.monotonic() + e.retry_after
+
+    async def publish(texts, final):
+        nonlocal last_edit
+        for i, text in enumerate(texts):
+            # Промежуточное состояние открытой части можно пропустить:
+            # следующая правка его догонит
+            is_open = i == len(texts) - 1
+            wait = final or not is_open
+            if i >= len(sent):
+                sent_message = await call(lambda: message.reply_text(text, parse_mode='HTML'), wait)
+                if sent_message is not None:
+                    sent.append((sent_message, text))
+                    last_edit = time.monotonic()
+                continue
+            sent_message, sent_text = sent[i]
+            if text == sent_text:
+                continue
+            # Открытую часть правим не слишком часто, закрытые - сразу
+            if not wait and time.monotonic() - last_edit < STREAM_EDIT_INTERVAL:
+                continue
+            try:
+                edited = await call(lambda: sent_message.edit_text(text, parse_mode='HTML'), wait)
+                if edited is not None:
+                    sent[i] = (edited, text)
+                    last_edit = time.monotonic()
+            except BadRequest as e:
+                logger.warning(f"Не удалось обновить сообщение: {e}")
+
+    try:
+        for batch, task in zip(batches, tasks):
+            batch_translations = await task
+            translated.extend(batch_translations)
+            parts.extend(map(line_block, batch, batch_translations))
+            await publish(parts.parts, final=False)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    texts, link_message = with_link(parts.parts, url)
+    await publish(texts, final=True)
+    if link_message:
+        await call(lambda: message.reply_text(link_message), wait=True)
+    return translated, parts.parts
+
+def is_lyrics_query(update):
+    """Поисковый запрос: новый такой же запрос чата отменяет предыдущий"""
+    message = update.message
+    return message is not None and bool(message.text) and not message.text.startswith('/')
+
 async def search_lyrics(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик поиска текста песни"""
     query = update.message.text.strip()
@@ -63,15 +266,26 @@ async def search_lyrics(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Пожалуйста, укажите название песни и исполнителя.")
         return
     
+    started = time.perf_counter()
     try:
+        # Популярные песни отдаются сразу из хранилища готовых ответов
+        record = await stored_song(query)
+        if record is not None:
+            await send_parts(update.message, record['parts'], record['url'])
+            await asyncio.to_thread(store.log_query, query, record['url'])
+            REQUESTS.inc(outcome='stored')
+            return
+
         # Ищем песню
-        result, error = scraper.search_song(query)
+        result, error = await scraper.search_song(query)
         
         if error:
+            REQUESTS.inc(outcome='not_found' if error in (NOT_FOUND_SEARCH, NOT_FOUND_LYRICS) else 'search_error')
             await update.message.reply_text(f"❌ {error}")
             return
         
         if not result:
+            REQUESTS.inc(outcome='not_found')
             await update.message.reply_text("❌ Песня не найдена. Попробуйте изменить запрос.")
             return
         
@@ -80,50 +294,219 @@ async def search_lyrics(update: Update, context: ContextTypes.DEFAULT_TYPE):
         lyrics = result['lyrics']
         url = result['url']
         
-        # Переводим построчно
-        lines = [line.strip() for line in lyrics.split('\n') if line.strip()]
-        translated_lines = []
-        for line in lines:
-            if line and len(line) > 3:  # Переводим только строки длиннее 3 символов
-                try:
-                    ru = translate_text(line)
-                    if ru and ru != line:  # Если перевод успешен и отличается от оригинала
-                        # Оригинал, затем перевод жирным
-                        translated_lines.append(f"{line}\n<b>{ru}</b>")
-                    else:
-                        translated_lines.append(line)
-                except Exception:
-                    translated_lines.append(line)
-            elif line:
-                translated_lines.append(line)
-            else:
-                translated_lines.append("")
-        # Собираем результат
-        translated_text = '\n\n'.join(translated_lines)
-        response_text = f"🎵 {title}\n\n{translated_text}\n\n🔗 {url}"
-        # Ограничение Telegram
-        max_length = 4000
-        if len(response_text) > max_length:
-            # Разбиваем на части
-            parts = []
-            current_part = f"🎵 {title}\n\n"
-            for block in translated_lines:
-                if len(current_part + block + '\n\n') > max_length:
-                    parts.append(current_part)
-                    current_part = block + '\n\n'
-                else:
-                    current_part += block + '\n\n'
-            if current_part:
-                parts.append(current_part)
-            await update.message.reply_text(parts[0], parse_mode='HTML')
-            for i, part in enumerate(parts[1:], 1):
-                await update.message.reply_text(f"📄 Часть {i+1}:\n{part}", parse_mode='HTML')
-            await update.message.reply_text(f"🔗 Полный текст: {url}")
+        lines = song_lines(lyrics)
+        if STREAMING_REPLIES:
+            translated, parts = await stream_lyrics(update.message, title, url, lines)
         else:
-            await update.message.reply_text(response_text, parse_mode='HTML')
+            # Переводим строки пакетами
+            translated = await translate_lines(lines)
+            parts = build_parts(title, lines, translated)
+            await send_parts(update.message, parts, url)
+        REQUESTS.inc(outcome='found')
+
+        # Следующий такой же запрос обслужит хранилище
+        record = song_record(result, lines, translated, parts)
+        if record is not None:
+            await asyncio.to_thread(store.put, record)
+        await asyncio.to_thread(store.log_query, query, url)
+    except asyncio.CancelledError:
+        # Пользователь прислал новый запрос - этот ответ уже не нужен
+        REQUESTS.inc(outcome='cancelled')
+        raise
     except Exception as e:
+        REQUESTS.inc(outcome='error')
         logger.error(f"Ошибка при поиске: {e}")
         await update.message.reply_text("❌ Произошла ошибка при поиске. Попробуйте позже.")
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage='total')
+
+def inline_result_id(url):
+    """id inline-результата: путь страницы Genius или хэш слишком длинного URL"""
+    if url.startswith(GENIUS_URL) and len(url[len(GENIUS_URL):].encode()) <= MAX_RESULT_ID:
+        return url[len(GENIUS_URL):]
+    return HASHED_RESULT_ID + hashlib.sha1(url.encode()).hexdigest()
+
+def inline_result_url(result_id):
+    """URL песни по id inline-результата (None, если хэш неизвестен)"""
+    if result_id.startswith(HASHED_RESULT_ID):
+        # Хэши лежат в хранилище: выбор мог прийти после перезапуска
+        # или в другой процесс бота
+        return store.result_url(result_id)
+    return GENIUS_URL + result_id
+
+def inline_result(url, title, artist):
+    """Подсказка inline-режима; текст песни подставляется после выбора"""
+    name = f"{title} — {artist}" if artist else title
+    return InlineQueryResultArticle(
+        id=inline_result_id(url),
+        title=title,
+        description=artist or None,
+        input_message_content=InputTextMessageContent(
+            f"🎵 {html_text(name)}\n\n⏳ Загружаю текст...", parse_mode='HTML'
+        ),
+        # Без клавиатуры Telegram не сообщает inline_message_id выбранного результата
+        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("Genius", url=url)]]),
+    )
+
+async def inline_suggestions(user_id, query_id, query):
+    """Подсказки для inline-запроса или None, если пользователь уже ввёл новый.
+
+    Локальный индекс отвечает сразу; к API Genius обращаемся, только если
+    уверенных совпадений нет, и только после паузы в наборе.
+    """
+    songs = {}
+    suggestions = await asyncio.to_thread(scraper.song_index.suggest, query, INLINE_RESULTS_LIMIT)
+    for score, url, artist, title in suggestions:
+        songs[url] = (title, artist, score)
+
+    confident = any(score >= STRONG_SUGGESTION for _, _, score in songs.values())
+    api_songs = scraper.cached_suggestions(query)
+    if api_songs is None and not confident:
+        await asyncio.sleep(INLINE_DEBOUNCE)
+        if inline_latest.get(user_id) != query_id:
+            return None
+        api_songs = await scraper.suggestions(query)
+
+    for song in api_songs or ():
+        songs.setdefault(song['url'], (song['title'], song['artist'], 0))
+    return [(url, title, artist) for url, (title, artist, _) in songs.items()][:INLINE_RESULTS_LIMIT]
+
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик inline-запросов (@bot название песни): подсказки по мере ввода"""
+    inline = update.inline_query
+    query = inline.query.strip()
+    if len(query) < 2:
+        await inline.answer([], cache_time=INLINE_CACHE_TIME)
+        return
+
+    user_id = inline.from_user.id
+    inline_latest[user_id] = inline.id
+    try:
+        with STAGE_SECONDS.time(stage='inline'):
+            songs = await inline_suggestions(user_id, inline.id, query)
+            if songs is None:
+                # Пользователь продолжил ввод - отвечать уже некому
+                return
+            ids = {inline_result_id(url): url for url, _, _ in songs}
+            hashed = {result_id: url for result_id, url in ids.items() if result_id.startswith(HASHED_RESULT_ID)}
+            if hashed:
+                await asyncio.to_thread(store.save_result_urls, hashed)
+            await inline.answer(
+                [inline_result(url, title, artist) for url, title, artist in songs],
+                cache_time=INLINE_CACHE_TIME,
+            )
+    except BadRequest as e:
+        # Ответ опоздал: Telegram уже закрыл этот запрос
+        logger.debug(f"Не удалось ответить на inline-запрос: {e}")
+    finally:
+        if inline_latest.get(user_id) == inline.id:
+            inline_latest.pop(user_id, None)
+
+def inline_text(title, lines, translations, url):
+    """Текст inline-сообщения: первая часть ответа и ссылка на полный текст"""
+    link = f"\n\n🔗 Полный текст: {html_text(url)}"
+    parts = build_parts(title, lines, translations, MAX_MESSAGE_LENGTH - utf16_length(link))
+    return parts[0].rstrip('\n') + link
+
+async def chosen_inline_result(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Подставляет текст песни в отправленное inline-сообщение"""
+    chosen = update.chosen_inline_result
+    if not chosen.inline_message_id:
+        return
+
+    started = time.perf_counter()
+    try:
+        url = await asyncio.to_thread(inline_result_url, chosen.result_id)
+        if url is None:
+            REQUESTS.inc(outcome='not_found')
+            await context.bot.edit_message_text(
+                f"❌ {NOT_FOUND_LYRICS}", inline_message_id=chosen.inline_message_id
+            )
+            return
+        record = await asyncio.to_thread(store.get, url)
+        if record is not None:
+            title, lines, translated = record['title'], record['lines'], record['translated']
+        else:
+            result, error = await scraper.get_lyrics(url)
+            if error or not result:
+                REQUESTS.inc(outcome='not_found')
+                await context.bot.edit_message_text(
+                    f"❌ {error or NOT_FOUND_LYRICS}", inline_message_id=chosen.inline_message_id
+                )
+                return
+            title, lines = result['title'], song_lines(result['lyrics'])
+            translated = await translate_lines(lines)
+            record = song_record(result, lines, translated, build_parts(title, lines, translated))
+            if record is not None:
+                await asyncio.to_thread(store.put, record)
+
+        with STAGE_SECONDS.time(stage='send'):
+            await context.bot.edit_message_text(
+                inline_text(title, lines, translated, url),
+                inline_message_id=chosen.inline_message_id,
+                parse_mode='HTML',
+                disable_web_page_preview=True,
+            )
+        await asyncio.to_thread(store.log_query, chosen.query, url)
+        REQUESTS.inc(outcome='inline')
+    except Exception as e:
+        REQUESTS.inc(outcome='error')
+        logger.error(f"Ошибка inline-режима: {e}")
+        # Иначе сообщение навсегда останется на "Загружаю текст..."
+        try:
+            await context.bot.edit_message_text(
+                "❌ Произошла ошибка при поиске. Попробуйте позже.",
+                inline_message_id=chosen.inline_message_id,
+            )
+        except Exception as edit_error:
+            logger.warning(f"Не удалось обновить inline-сообщение: {edit_error}")
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage='total')
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /stats (только для администраторов)"""
+    if update.effective_user is None or update.effective_user.id not in ADMIN_IDS:
+        return
+
+    lines = ["📊 Статистика", "", "Стадии (количество, среднее, p95):"]
+    for (stage,), (count, average, p95) in sorted(STAGE_SECONDS.summary().items()):
+        lines.append(f"• {stage}: {count}, {average * 1000:.0f} мс, ≤{p95 * 1000:.0f} мс")
+
+    lines += ["", "Стратегии поиска:"]
+    strategies = {}
+    for (strategy, outcome), value in SEARCH_STRATEGY.values().items():
+        strategies.setdefault(strategy, []).append(f"{outcome} {value}")
+    for strategy, outcomes in sorted(strategies.items()):
+        lines.append(f"• {strategy}: {', '.join(sorted(outcomes))}")
+
+    lines += ["", "Перевод:"]
+    for name, health in translate.router.stats().items():
+        latency = f"{health['latency'] * 1000:.0f} мс" if health['latency'] is not None else "-"
+        lines.append(
+            f"• {name}: {latency}, ошибки {health['errors']}/{health['requests']}, автомат {health['circuit']}"
+        )
+    cache = translate.translation_cache.stats()
+    lines.append(f"• кэш переводов: попаданий {cache['hits']}, промахов {cache['misses']}")
+    store_stats = store.stats()
+    lines.append(f"• готовые ответы: попаданий {store_stats['hits']}, промахов {store_stats['misses']}")
+
+    lines += ["", "Кэши поиска:"]
+    for name, cache in (('запросы', scraper.query_cache), ('тексты', scraper.lyrics_cache)):
+        cache_stats = cache.stats()
+        lines.append(
+            f"• {name}: {cache_stats['size']} записей, попаданий {cache_stats['hits']}, "
+            f"промахов {cache_stats['misses']}"
+        )
+
+    outcomes = ', '.join(f"{outcome} {value}" for (outcome,), value in sorted(REQUESTS.values().items()))
+    lines += ["", f"Запросы: {outcomes or 'нет'}"]
+    processor = context.application.update_processor
+    if isinstance(processor, FairUpdateProcessor):
+        lines.append(
+            f"Очередь: чатов {processor.active_users}, вытеснено {processor.superseded}, "
+            f"отброшено {processor.dropped}"
+        )
+    await update.message.reply_text('\n'.join(lines))
 
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик ошибок"""
@@ -131,27 +514,112 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update and update.message:
         await update.message.reply_text("❌ Произошла ошибка. Попробуйте позже.")
 
-def main():
-    """Основная функция запуска бота"""
-    if not TELEGRAM_BOT_TOKEN:
-        print("❌ Ошибка: Не указан токен бота!")
-        print("Создайте файл .env и добавьте TELEGRAM_BOT_TOKEN=your_token_here")
-        return
-    
+async def preload_caches():
+    """Загружает сохранённые кэши в память, не задерживая приём обновлений"""
+    started = time.monotonic()
+    # Клиент создаётся в цикле событий, остальное - в потоках
+    get_client()
+    await asyncio.to_thread(lyrics_extractor.preload)
+    songs = await asyncio.to_thread(scraper.song_index.load)
+    translations = await asyncio.to_thread(translate.translation_cache.preload)
+    answers = await asyncio.to_thread(store.preload)
+    logger.info(
+        f"Кэши загружены за {time.monotonic() - started:.2f} с: песен в индексе {songs}, "
+        f"переводов {translations}, готовых ответов {answers}"
+    )
+
+async def startup(application: Application):
+    """Запуск endpoint'а метрик, загрузки кэшей и фонового прогрева хранилища"""
+    if METRICS_PORT:
+        application.bot_data['metrics_server'] = await start_http_server(METRICS_PORT)
+    # Задачи в фоне: post_init выполняется до начала приёма обновлений
+    if PRELOAD_CACHES:
+        application.bot_data['preload'] = asyncio.create_task(preload_caches())
+    if WARM_UP_INTERVAL:
+        application.bot_data['warm_up'] = asyncio.create_task(
+            warm_up_forever(store, scraper, prepare_song)
+        )
+
+async def shutdown(application: Application):
+    """Закрытие общего пула HTTP-соединений и файлов SQLite при остановке"""
+    for name in ('preload', 'warm_up'):
+        task = application.bot_data.pop(name, None)
+        if task is not None:
+            task.cancel()
+    metrics_server = application.bot_data.pop('metrics_server', None)
+    if metrics_server is not None:
+        metrics_server.close()
+    await close_client()
+    store.close()
+    translate.translation_cache.close()
+    scraper.song_index.close()
+
+def build_application():
+    """Собирает приложение с обработчиками (без запуска)"""
     # Создаем приложение
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    # Обновления разных чатов обрабатываются параллельно пулом воркеров,
+    # внутри одного чата - не больше PER_USER_CONCURRENCY одновременно
+    processor = FairUpdateProcessor(
+        UPDATE_QUEUE_LIMIT,
+        workers=CONCURRENT_UPDATES,
+        per_user=PER_USER_CONCURRENCY,
+        per_user_queue=PER_USER_QUEUE_LIMIT,
+        supersedes=is_lyrics_query,
+    )
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .concurrent_updates(processor)
+        .post_init(startup)
+        .post_shutdown(shutdown)
+        .build()
+    )
     
     # Добавляем обработчики
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("stats", stats_command))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, search_lyrics))
+    application.add_handler(InlineQueryHandler(inline_query))
+    application.add_handler(ChosenInlineResultHandler(chosen_inline_result))
     
     # Добавляем обработчик ошибок
     application.add_error_handler(error_handler)
-    
+    return application
+
+def main():
+    """Основная функция запуска бота"""
+    parser = argparse.ArgumentParser(description="Бот с текстами песен и переводом")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--polling', action='store_true', help='только long polling, даже если задан WEBHOOK_URL')
+    mode.add_argument('--webhook', action='store_true', help='только webhook (нужен WEBHOOK_URL)')
+    args = parser.parse_args()
+
+    if not TELEGRAM_BOT_TOKEN:
+        print("❌ Ошибка: Не указан токен бота!")
+        print("Создайте файл .env и добавьте TELEGRAM_BOT_TOKEN=your_token_here")
+        return
+    if args.webhook and not WEBHOOK_URL:
+        print("❌ Ошибка: Для режима webhook нужен WEBHOOK_URL")
+        return
+
+    application = build_application()
+
     # Запускаем бота
-    print("🤖 Бот запущен...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if WEBHOOK_URL and not args.polling:
+        print(f"🤖 Бот запущен в режиме webhook на порту {PORT}...")
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=ALLOWED_UPDATES,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+        )
+    else:
+        print("🤖 Бот запущен...")
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
@@ -0,0 +1,146 @@
+import sqlite3
+import time
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш с ограничением по числу записей"""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Счётчики попаданий и промахов"""
+        return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+class SQLiteConnection:
+    """Соединение с SQLite для данных на диске (открывается при первом обращении).
+
+    Режим WAL позволяет читать из нескольких процессов во время записи,
+    таблицы схемы создаются при открытии. Соединение общее для потоков,
+    поэтому запросы к нему владелец выполняет под своей блокировкой.
+    """
+
+    def __init__(self, path, *schema):
+        self.path = path
+        self.schema = schema
+        self._db = None
+
+    def get(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            for statement in self.schema:
+                self._db.execute(statement)
+            self._db.commit()
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class TTLCache:
+    """LRU-кэш с временем жизни записей и ограничением по памяти.
+
+    Каждая запись живёт ttl секунд (можно задать своё время для отдельной
+    записи, например короткое для отрицательных результатов). При переполнении
+    по числу записей или по суммарному весу вытесняются давно не используемые.
+    """
+
+    def __init__(self, maxsize=1000, ttl=3600, max_bytes=None, weigher=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.weigher = weigher or (lambda value: 1)
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value, weight = entry
+                if expires_at > self.clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                # Запись устарела
+                del self._data[key]
+                self.bytes -= weight
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        weight = self.weigher(value)
+        expires_at = self.clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self._data[key] = (expires_at, value, weight)
+            self.bytes += weight
+            while self._data and (
+                len(self._data) > self.maxsize
+                or (self.max_bytes is not None and self.bytes > self.max_bytes)
+            ):
+                _, (_, _, evicted_weight) = self._data.popitem(last=False)
+                self.bytes -= evicted_weight
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Счётчики попаданий, промахов и вытеснений"""
+        return {
+            'size': len(self._data),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -1,7 +1,114 @@
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+# Файл .env загружает точка входа (bot.py) до импорта этого модуля,
+# поэтому сам импорт config не имеет побочных эффектов
 
 # Токен Telegram бота
-TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN') or "7975759917:AAGXrCSuygjj6zkeymuaJaAyw72RvRqFgOQ" 
\ No newline at end of file
+TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN') or "7975759917:AAGXrCSuygjj6zkeymuaJaAyw72RvRqFgOQ"
+
+# Сколько обновлений Telegram обрабатывается одновременно (воркеры),
+# сколько из них может быть у одного чата и сколько всего ждёт в очереди
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '256'))
+PER_USER_CONCURRENCY = int(os.getenv('PER_USER_CONCURRENCY', '1'))
+UPDATE_QUEUE_LIMIT = int(os.getenv('UPDATE_QUEUE_LIMIT', '10000'))
+# Сколько обновлений одного чата может ждать в очереди (лишние отбрасываются)
+PER_USER_QUEUE_LIMIT = int(os.getenv('PER_USER_QUEUE_LIMIT', '5'))
+
+# Режим webhook: включается, если задан публичный адрес WEBHOOK_URL.
+# PORT выставляет платформа; секрет защищает путь от чужих запросов
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+PORT = int(os.getenv('PORT', '8443'))
+# Сколько одновременных соединений Telegram открывает к webhook (1-100)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+# Общий пул HTTP-соединений
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', '100'))
+HTTP_MAX_KEEPALIVE = int(os.getenv('HTTP_MAX_KEEPALIVE', '20'))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '10'))
+# Отдельные пулы для хостов: "хост=соединений:keep-alive,..."
+HTTP_HOST_POOLS = os.getenv('HTTP_HOST_POOLS', 'genius.com=40:20,translate.googleapis.com=20:10')
+# Сколько секунд держать простаивающее соединение открытым
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '60'))
+# HTTP/2 (нужен пакет h2; без него используется HTTP/1.1)
+HTTP2 = os.getenv('HTTP2', '1') == '1'
+
+# Лимиты исходящих запросов по хостам: "хост=запросов_в_секунду:всплеск,..."
+RATE_LIMITS = os.getenv(
+    'RATE_LIMITS',
+    'genius.com=10:20,translate.googleapis.com=10:20,api.mymemory.translated.net=2:5',
+)
+RATE_LIMIT_DEFAULT = os.getenv('RATE_LIMIT_DEFAULT', '20:40')
+# Повторы после 429/503: число попыток и границы экспоненциальной задержки (секунды)
+RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', '3'))
+BACKOFF_BASE = float(os.getenv('BACKOFF_BASE', '0.5'))
+BACKOFF_MAX = float(os.getenv('BACKOFF_MAX', '30'))
+
+# Сколько запросов с пакетами строк одной песни отправляется к сервису перевода одновременно
+TRANSLATE_CONCURRENCY = int(os.getenv('TRANSLATE_CONCURRENCY', '8'))
+
+# Кэш переводов: файл SQLite (пустая строка - только память) и размер LRU
+TRANSLATION_CACHE_PATH = os.getenv('TRANSLATION_CACHE_PATH', 'translations.sqlite3')
+TRANSLATION_CACHE_SIZE = int(os.getenv('TRANSLATION_CACHE_SIZE', '50000'))
+
+# Кэш поиска: запрос -> URL песни и URL -> текст песни (время жизни в секундах)
+QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', '10000'))
+QUERY_CACHE_TTL = int(os.getenv('QUERY_CACHE_TTL', '86400'))
+LYRICS_CACHE_SIZE = int(os.getenv('LYRICS_CACHE_SIZE', '2000'))
+LYRICS_CACHE_TTL = int(os.getenv('LYRICS_CACHE_TTL', '21600'))
+LYRICS_CACHE_MAX_BYTES = int(os.getenv('LYRICS_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# Сколько помнить, что песня не найдена
+NEGATIVE_CACHE_TTL = int(os.getenv('NEGATIVE_CACHE_TTL', '120'))
+
+# Крайние сроки стратегий поиска (секунды); стратегии выполняются параллельно
+SEARCH_API_TIMEOUT = float(os.getenv('SEARCH_API_TIMEOUT', '10'))
+SEARCH_ALTERNATIVE_TIMEOUT = float(os.getenv('SEARCH_ALTERNATIVE_TIMEOUT', '10'))
+
+# Локальный индекс песен: файл SQLite (пустая строка - только память)
+# и минимальная доля совпадения триграмм для нечёткого поиска
+SONG_INDEX_PATH = os.getenv('SONG_INDEX_PATH', 'songs.sqlite3')
+SONG_INDEX_MIN_SCORE = float(os.getenv('SONG_INDEX_MIN_SCORE', '0.5'))
+# Сколько последних песен индекса держать в памяти
+SONG_INDEX_SIZE = int(os.getenv('SONG_INDEX_SIZE', '20000'))
+
+# Хранилище готовых ответов (текст, перевод, части сообщения): файл SQLite,
+# размер LRU в памяти и срок, после которого прогрев обновляет запись (секунды)
+LYRICS_STORE_PATH = os.getenv('LYRICS_STORE_PATH', 'lyrics.sqlite3')
+LYRICS_STORE_SIZE = int(os.getenv('LYRICS_STORE_SIZE', '500'))
+LYRICS_STORE_TTL = int(os.getenv('LYRICS_STORE_TTL', str(7 * 24 * 3600)))
+# Загружать сохранённые кэши (индекс, переводы, готовые ответы) в память
+# в фоне сразу после запуска
+PRELOAD_CACHES = os.getenv('PRELOAD_CACHES', '1') == '1'
+# Фоновый прогрев популярных песен: период (секунды, 0 - выключен) и число песен за проход
+WARM_UP_INTERVAL = int(os.getenv('WARM_UP_INTERVAL', '3600'))
+WARM_UP_LIMIT = int(os.getenv('WARM_UP_LIMIT', '200'))
+
+# Inline-режим: число подсказок, пауза перед запросом к API (секунды),
+# сколько Telegram кэширует ответ (секунды), кэш подсказок API
+INLINE_RESULTS_LIMIT = int(os.getenv('INLINE_RESULTS_LIMIT', '10'))
+INLINE_DEBOUNCE = float(os.getenv('INLINE_DEBOUNCE', '0.3'))
+INLINE_CACHE_TIME = int(os.getenv('INLINE_CACHE_TIME', '300'))
+SUGGEST_CACHE_SIZE = int(os.getenv('SUGGEST_CACHE_SIZE', '10000'))
+SUGGEST_CACHE_TTL = int(os.getenv('SUGGEST_CACHE_TTL', '86400'))
+
+# Прогрессивная отправка текста: первые строки уходят, не дожидаясь остальных
+STREAMING_REPLIES = os.getenv('STREAMING_REPLIES', '1') == '1'
+STREAM_FIRST_LINES = int(os.getenv('STREAM_FIRST_LINES', '12'))
+STREAM_BATCH_LINES = int(os.getenv('STREAM_BATCH_LINES', '40'))
+# Как часто можно править открытое сообщение (секунды)
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', '1.0'))
+
+# Backend'ы перевода в порядке приоритета (google, mymemory, stub)
+TRANSLATE_BACKENDS = os.getenv('TRANSLATE_BACKENDS', 'google,mymemory')
+# Штраф (секунды задержки) за каждую позицию backend'а в списке
+TRANSLATE_PRIORITY_PENALTY = float(os.getenv('TRANSLATE_PRIORITY_PENALTY', '0.5'))
+# Автомат защиты: сколько ошибок подряд выключают backend и на сколько секунд
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30'))
+
+# Порт HTTP-endpoint'а /metrics в формате Prometheus (0 - выключен)
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+# ID пользователей Telegram, которым доступна команда /stats (через запятую)
+ADMIN_IDS = {int(user_id) for user_id in os.getenv('ADMIN_IDS', '').split(',') if user_id.strip()}
@@ -1,179 +1,303 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
 import re
 from urllib.parse import quote_plus
 import time
 
+from cache import TTLCache
+from config import (
+    QUERY_CACHE_SIZE, QUERY_CACHE_TTL, LYRICS_CACHE_SIZE, LYRICS_CACHE_TTL,
+    LYRICS_CACHE_MAX_BYTES, NEGATIVE_CACHE_TTL, SUGGEST_CACHE_SIZE, SUGGEST_CACHE_TTL,
+    SEARCH_API_TIMEOUT, SEARCH_ALTERNATIVE_TIMEOUT,
+)
+from http_client import get_client, sync_session
+from lyrics_extractor import extract_song
+from metrics import SEARCH_STRATEGY, STAGE_SECONDS
+from singleflight import SingleFlight
+from song_index import SongIndex
+
+# Ошибки "не найдено", которые можно ненадолго запомнить
+NOT_FOUND_SEARCH = "Песня не найдена даже с альтернативным поиском"
+NOT_FOUND_LYRICS = "Текст песни не найден"
+
+# Блок страницы песни сразу после контейнеров с текстом: дальше разбирать нечего.
+# Учитывается только после начала первого контейнера - имя класса встречается
+# и раньше, например в стилях в <head>
+LYRICS_START_MARKER = b'data-lyrics-container'
+LYRICS_END_MARKER = b'LyricsFooter__'
+
+
+def _soup(content, parser):
+    """Дерево BeautifulSoup; bs4 загружается только при первом разборе"""
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(content, parser)
+
+
+def _result_weight(entry):
+    """Примерный размер записи кэша текстов в байтах"""
+    result, error = entry
+    if result is None:
+        return len(error or '')
+    return len(result['title']) + len(result['lyrics']) + len(result['url'])
+
+
+async def first_by_priority(jobs):
+    """Запускает корутины одновременно и возвращает (результат, ошибка).
+
+    jobs - список (корутина, таймаут) в порядке приоритета. Результатом
+    становится первый непустой ответ по приоритету: более приоритетные
+    задачи дожидаются (не дольше своего таймаута), оставшиеся отменяются.
+    Если результата нет, возвращается первая возникшая ошибка.
+    """
+    tasks = [asyncio.ensure_future(asyncio.wait_for(coro, timeout)) for coro, timeout in jobs]
+    first_error = None
+    try:
+        for task in tasks:
+            try:
+                result = await task
+            except Exception as e:
+                first_error = first_error or e
+                continue
+            if result:
+                return result, None
+        return None, first_error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # Помечаем исключение прочитанным, чтобы asyncio не ругался
+                task.exception()
+
+
+async def count_strategy(strategy, coro):
+    """Учитывает итог стратегии поиска в метриках"""
+    try:
+        song_url = await coro
+    except asyncio.CancelledError:
+        SEARCH_STRATEGY.inc(strategy=strategy, result='cancelled')
+        raise
+    except Exception:
+        SEARCH_STRATEGY.inc(strategy=strategy, result='error')
+        raise
+    SEARCH_STRATEGY.inc(strategy=strategy, result='hit' if song_url else 'miss')
+    return song_url
+
+
 class GeniusScraper:
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        })
-    
+        # Локальный индекс "исполнитель/название -> URL"
+        self.song_index = SongIndex()
+        # Нормализованный запрос -> (URL песни, ошибка)
+        self.query_cache = TTLCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+        # URL песни -> (результат, ошибка)
+        self.lyrics_cache = TTLCache(
+            maxsize=LYRICS_CACHE_SIZE,
+            ttl=LYRICS_CACHE_TTL,
+            max_bytes=LYRICS_CACHE_MAX_BYTES,
+            weigher=_result_weight,
+        )
+
+    @property
+    def session(self):
+        """Синхронная сессия requests текущего потока"""
+        return sync_session()
+
     def search_song(self, query):
         """Поиск песни на Genius.com"""
+        query = self._clean_query(query)
+        cached = self.query_cache.get(query)
+        if cached is not None:
+            song_url, error = cached
+            if error:
+                return None, error
+            return self.get_lyrics(song_url)
+
+        result, error = self._search_song(query)
+        self._remember_query(query, result, error)
+        return result, error
+
+    def _search_song(self, query):
+        """Поиск песни без кэша (query уже очищен)"""
         try:
-            # Очищаем и улучшаем запрос
-            query = self._clean_query(query)
-            
             # Попробуем прямой поиск по известным URL
             direct_url = self._try_direct_search(query)
             if direct_url:
                 return self.get_lyrics(direct_url)
-            
+
             # Если прямой поиск не сработал, попробуем API
             api_result = self._search_via_api(query)
             if api_result:
                 return self.get_lyrics(api_result)
-            
+
             # Альтернативный поиск
             return self._alternative_search(query)
-            
+
         except Exception as e:
             return None, f"Ошибка при поиске: {str(e)}"
-    
+
+    def _remember_query(self, query, result, error):
+        """Запоминает URL найденной песни или ненадолго - отсутствие результата"""
+        if result:
+            self.query_cache.set(query, (result['url'], None))
+        elif error == NOT_FOUND_SEARCH:
+            self.query_cache.set(query, (None, error), ttl=NEGATIVE_CACHE_TTL)
+
+    def _remember_lyrics(self, song_url, result, error):
+        """Запоминает текст песни или ненадолго - отсутствие текста на странице"""
+        if result:
+            self.lyrics_cache.set(song_url, (result, None))
+        elif error == NOT_FOUND_LYRICS:
+            self.lyrics_cache.set(song_url, (None, error), ttl=NEGATIVE_CACHE_TTL)
+
     def _try_direct_search(self, query):
-        """Попытка прямого поиска по известным паттернам"""
-        # Попробуем создать URL напрямую для популярных песен
-        query_lower = query.lower()
-        
-        # Известные паттерны для популярных песен
-        patterns = [
-            ("bohemian rhapsody queen", "/Queen-bohemian-rhapsody-lyrics"),
-            ("let it be beatles", "/The-Beatles-let-it-be-lyrics"),
-            ("yesterday beatles", "/The-Beatles-yesterday-lyrics"),
-            ("imagine john lennon", "/John-Lennon-imagine-lyrics"),
-            ("hotel california eagles", "/Eagles-hotel-california-lyrics"),
-            ("stairway to heaven led zeppelin", "/Led-Zeppelin-stairway-to-heaven-lyrics"),
-            ("smells like teen spirit nirvana", "/Nirvana-smells-like-teen-spirit-lyrics"),
-            ("wonderwall oasis", "/Oasis-wonderwall-lyrics"),
-            ("creep radiohead", "/Radiohead-creep-lyrics"),
-            ("bohemian rhapsody", "/Queen-bohemian-rhapsody-lyrics"),
-            ("let it be", "/The-Beatles-let-it-be-lyrics"),
-            ("yesterday", "/The-Beatles-yesterday-lyrics"),
-        ]
-        
-        for pattern_query, url_path in patterns:
-            if pattern_query in query_lower or query_lower in pattern_query:
-                full_url = "https://genius.com" + url_path
-                # Проверим, что страница существует
-                try:
-                    response = self.session.get(full_url, timeout=5)
-                    if response.status_code == 200:
-                        return full_url
-                except:
-                    continue
-        
-        return None
-    
+        """Прямой поиск по локальному индексу песен (без запросов к сайту)"""
+        return self.song_index.lookup(query)
+
+    def _api_search_url(self, query):
+        """URL поискового API Genius"""
+        return f"https://genius.com/api/search/multi?per_page=5&q={quote_plus(query)}"
+
+    def _parse_api_hits(self, data):
+        """Песни из ответа поискового API: список {url, title, artist}"""
+        songs = []
+        if 'response' in data and 'sections' in data['response']:
+            for section in data['response']['sections']:
+                if section.get('type') == 'song':
+                    for hit in section.get('hits', []):
+                        if 'result' in hit and 'url' in hit['result']:
+                            result = hit['result']
+                            songs.append({
+                                'url': result['url'],
+                                'title': result.get('title') or result.get('full_title') or '',
+                                'artist': (result.get('primary_artist') or {}).get('name'),
+                            })
+        return songs
+
+    def _remember_songs(self, songs):
+        """Пополняет локальный индекс песнями из ответа API"""
+        for song in songs:
+            if song['title']:
+                self.song_index.add(song['url'], song['title'], song['artist'])
+
     def _search_via_api(self, query):
         """Поиск через API Genius (если доступен)"""
         try:
             # Попробуем использовать API поиск
-            api_url = f"https://genius.com/api/search/multi?per_page=5&q={quote_plus(query)}"
-            response = self.session.get(api_url, timeout=10)
-            
+            response = self.session.get(self._api_search_url(query), timeout=10)
+
             if response.status_code == 200:
-                data = response.json()
-                if 'response' in data and 'sections' in data['response']:
-                    for section in data['response']['sections']:
-                        if section.get('type') == 'song':
-                            for hit in section.get('hits', []):
-                                if 'result' in hit and 'url' in hit['result']:
-                                    return hit['result']['url']
+                songs = self._parse_api_hits(response.json())
+                self._remember_songs(songs)
+                return songs[0]['url'] if songs else None
         except:
             pass
-        
+
         return None
-    
+
     def _clean_query(self, query):
         """Очистка и улучшение поискового запроса"""
         # Убираем лишние пробелы
         query = ' '.join(query.split())
-        
+
         # Улучшаем запрос для популярных песен
         query = query.lower()
-        
+
         return query
-    
+
+    def _query_variations(self, query):
+        """Варианты запроса для альтернативного поиска"""
+        variations = [
+            query,
+            query.replace('the ', '').replace('The ', ''),
+            query.replace('beatles', 'Beatles').replace('beatles', 'The Beatles'),
+            query + ' lyrics',
+            query.split()[0] + ' ' + ' '.join(query.split()[1:])  # Убираем первое слово
+        ]
+        return [variation for variation in variations if variation != query]
+
+    def _find_song_link(self, content):
+        """Ссылка на первую песню со страницы поиска"""
+        soup = _soup(content, 'html.parser')
+
+        # Ищем ссылки на песни
+        song_link = soup.find('a', href=re.compile(r'/songs/'))
+        if song_link:
+            return "https://genius.com" + song_link['href']
+        return None
+
     def _alternative_search(self, query):
         """Альтернативный поиск с измененным запросом"""
         try:
             # Попробуем разные варианты запроса
-            variations = [
-                query,
-                query.replace('the ', '').replace('The ', ''),
-                query.replace('beatles', 'Beatles').replace('beatles', 'The Beatles'),
-                query + ' lyrics',
-                query.split()[0] + ' ' + ' '.join(query.split()[1:])  # Убираем первое слово
-            ]
-            
-            for variation in variations:
-                if variation != query:
-                    encoded_query = quote_plus(variation)
-                    search_url = f"https://genius.com/search?q={encoded_query}"
-                    
-                    response = self.session.get(search_url, timeout=10)
-                    response.raise_for_status()
-                    
-                    soup = BeautifulSoup(response.content, 'html.parser')
-                    
-                    # Ищем ссылки на песни
-                    song_link = soup.find('a', href=re.compile(r'/songs/'))
-                    
-                    if song_link:
-                        song_url = "https://genius.com" + song_link['href']
-                        return self.get_lyrics(song_url)
-            
-            return None, "Песня не найдена даже с альтернативным поиском"
-            
+            for variation in self._query_variations(query):
+                encoded_query = quote_plus(variation)
+                search_url = f"https://genius.com/search?q={encoded_query}"
+
+                response = self.session.get(search_url, timeout=10)
+                response.raise_for_status()
+
+                song_url = self._find_song_link(response.content)
+                if song_url:
+                    return self.get_lyrics(song_url)
+
+            return None, NOT_FOUND_SEARCH
+
         except Exception as e:
             return None, f"Ошибка при альтернативном поиске: {str(e)}"
-    
+
     def get_lyrics(self, song_url):
         """Извлечение текста песни с страницы Genius"""
+        cached = self.lyrics_cache.get(song_url)
+        if cached is not None:
+            return cached
+
         try:
             response = self.session.get(song_url, timeout=10)
             response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Ищем заголовок песни
-            title_element = soup.find('h1')
-            title = title_element.get_text().strip() if title_element else "Неизвестная песня"
-            
-            # Улучшенный поиск текста песни
-            lyrics = self._extract_lyrics(soup)
-            
-            if not lyrics:
-                return None, "Текст песни не найден"
-            
-            # Очищаем текст от лишних пробелов
-            lyrics = re.sub(r'\n\s*\n', '\n\n', lyrics)
-            lyrics = lyrics.strip()
-            
-            return {
-                'title': title,
-                'lyrics': lyrics,
-                'url': song_url
-            }, None
-            
+
+            result, error = self._parse_song_page(response.content, song_url)
+            self._remember_lyrics(song_url, result, error)
+            return result, error
+
         except Exception as e:
             return None, f"Ошибка при извлечении текста: {str(e)}"
-    
+
+    def _parse_song_page(self, content, song_url):
+        """Разбор HTML страницы песни в результат (title, lyrics, url)"""
+        # Быстрый путь: lxml и только контейнеры с текстом
+        title, lyrics = extract_song(content)
+
+        if not lyrics:
+            # Запасной путь: полное дерево BeautifulSoup и эвристики
+            soup = _soup(content, 'lxml')
+            if title is None:
+                title_element = soup.find('h1')
+                title = title_element.get_text().strip() if title_element else None
+            lyrics = self._extract_lyrics(soup)
+
+        title = title or "Неизвестная песня"
+
+        if not lyrics:
+            return None, NOT_FOUND_LYRICS
+
+        # Пустые строки внутри текста не схлопываем: бот всё равно пропускает
+        # их при разбивке, а лишний проход регулярным выражением по всему
+        # тексту и его копия не нужны
+        lyrics = lyrics.strip()
+
+        return {
+            'title': title,
+            'lyrics': lyrics,
+            'url': song_url
+        }, None
+
     def _extract_lyrics(self, soup):
         """Извлечение текста песни различными способами"""
         # Способ 1: data-lyrics-container
         lyrics_div = soup.find('div', {'data-lyrics-container': 'true'})
         if lyrics_div:
             return lyrics_div.get_text()
-        
+
         # Способ 2: классы с lyrics
         lyrics_selectors = [
             'div[class*="lyrics"]',
@@ -182,20 +306,22 @@ class GeniusScraper:
             'div[class*="song_body_lyrics"]',
             'div[class*="lyrics_container"]'
         ]
-        
+
         for selector in lyrics_selectors:
             lyrics_div = soup.select_one(selector)
             if lyrics_div:
                 return lyrics_div.get_text()
-        
+
         # Способ 3: поиск по тексту
         for div in soup.find_all('div'):
-            if div.get_text().strip() and len(div.get_text()) > 100:
+            # get_text обходит всё поддерево - вызываем один раз на div
+            text = div.get_text()
+            if len(text) > 100 and text.strip():
                 # Проверяем, содержит ли div текст песни
-                text = div.get_text()
-                if any(word in text.lower() for word in ['verse', 'chorus', 'bridge', 'refrain']):
+                lowered = text.lower()
+                if any(word in lowered for word in ['verse', 'chorus', 'bridge', 'refrain']):
                     return text
-        
+
         # Способ 4: поиск в статье
         article = soup.find('article') or soup.find('main')
         if article:
@@ -206,8 +332,193 @@ class GeniusScraper:
                 text = p.get_text().strip()
                 if text and len(text) > 10:
                     lyrics_parts.append(text)
-            
+
             if lyrics_parts:
                 return '\n\n'.join(lyrics_parts)
-        
-        return None 
\ No newline at end of file
+
+        return None
+
+
+class AsyncGeniusScraper(GeniusScraper):
+    """Неблокирующий скрапер на общем пуле соединений httpx.
+
+    Сетевые запросы выполняются через asyncio, а разбор HTML - в пуле
+    потоков, чтобы не останавливать цикл событий бота.
+    """
+
+    def __init__(self, client=None):
+        super().__init__()
+        self._client = client
+        # Одинаковые запросы и URL, пришедшие одновременно, выполняются один раз
+        self._flights = SingleFlight()
+        # Запрос в нижнем регистре -> песни из ответа API [{url, title, artist}]
+        self.suggest_cache = TTLCache(maxsize=SUGGEST_CACHE_SIZE, ttl=SUGGEST_CACHE_TTL)
+
+    @property
+    def client(self):
+        return self._client or get_client()
+
+    async def search_song(self, query):
+        """Поиск песни на Genius.com"""
+        query = self._clean_query(query)
+        return await self._flights.do(('query', query), self._search_cached, query)
+
+    async def _search_cached(self, query):
+        """Поиск с учётом кэша запросов (query уже очищен)"""
+        cached = self.query_cache.get(query)
+        if cached is not None:
+            song_url, error = cached
+            if error:
+                return None, error
+            return await self.get_lyrics(song_url)
+
+        result, error = await self._search_song(query)
+        self._remember_query(query, result, error)
+        return result, error
+
+    async def _search_song(self, query):
+        """Поиск песни без кэша.
+
+        Сначала локальный индекс песен - при попадании сразу загружается
+        текст. Иначе API и альтернативный поиск запускаются одновременно:
+        побеждает первый найденный URL по приоритету, остальное отменяется.
+        """
+        # Нечёткий поиск по большому индексу заметно занимает процессор
+        direct_url = await asyncio.to_thread(self._try_direct_search, query)
+        SEARCH_STRATEGY.inc(strategy='index', result='hit' if direct_url else 'miss')
+        if direct_url:
+            result, error = await self.get_lyrics(direct_url)
+            if result:
+                return result, error
+
+        with STAGE_SECONDS.time(stage='search'):
+            song_url, error = await first_by_priority([
+                (count_strategy('api', self._search_via_api(query)), SEARCH_API_TIMEOUT),
+                (count_strategy('alternative', self._alternative_url(query)), SEARCH_ALTERNATIVE_TIMEOUT),
+            ])
+        if song_url:
+            return await self.get_lyrics(song_url)
+        if error:
+            return None, f"Ошибка при поиске: {str(error) or type(error).__name__}"
+        return None, NOT_FOUND_SEARCH
+
+    async def _search_via_api(self, query):
+        """Поиск через API Genius (если доступен)"""
+        songs = await self.suggestions(query)
+        return songs[0]['url'] if songs else None
+
+    def cached_suggestions(self, query):
+        """Песни из кэша ответов API или None, если запроса ещё не было"""
+        return self.suggest_cache.get(self._clean_query(query).lower())
+
+    async def suggestions(self, query):
+        """Песни из ответа поискового API (с кэшем): список {url, title, artist}"""
+        key = self._clean_query(query).lower()
+        cached = self.suggest_cache.get(key)
+        if cached is not None:
+            return cached
+        return await self._flights.do(('suggest', key), self._fetch_suggestions, key)
+
+    async def _fetch_suggestions(self, query):
+        """Запрос к поисковому API; ошибки не кэшируются"""
+        try:
+            response = await self.client.get(self._api_search_url(query), timeout=10)
+            if response.status_code != 200:
+                return []
+            songs = self._parse_api_hits(response.json())
+        except Exception:
+            return []
+
+        await asyncio.to_thread(self._remember_songs, songs)
+        self.suggest_cache.set(query, songs)
+        return songs
+
+    async def _search_page_url(self, variation):
+        """Первая песня со страницы поиска Genius для варианта запроса"""
+        search_url = f"https://genius.com/search?q={quote_plus(variation)}"
+        response = await self.client.get(search_url, timeout=10)
+        response.raise_for_status()
+        return await asyncio.to_thread(self._find_song_link, response.content)
+
+    async def _alternative_url(self, query):
+        """URL песни по вариантам запроса (варианты проверяются одновременно)"""
+        song_url, error = await first_by_priority(
+            [(self._search_page_url(variation), None) for variation in self._query_variations(query)]
+        )
+        if song_url is None and error is not None:
+            raise error
+        return song_url
+
+    async def get_lyrics(self, song_url):
+        """Извлечение текста песни с страницы Genius"""
+        cached = self.lyrics_cache.get(song_url)
+        if cached is not None:
+            return cached
+        return await self._flights.do(('lyrics', song_url), self._fetch_lyrics, song_url)
+
+    async def _read_until_lyrics_end(self, body):
+        """Читает поток страницы до конца блока с текстом.
+
+        Возвращает (прочитанное начало, страница прочитана целиком).
+        """
+        content = bytearray()
+        # Откуда искать маркер: куски могут разрезать его пополам
+        start = 0
+        marker = LYRICS_START_MARKER
+        async for chunk in body:
+            content += chunk
+            found = content.find(marker, start)
+            if found != -1 and marker is LYRICS_START_MARKER:
+                start = found + len(marker)
+                marker = LYRICS_END_MARKER
+                found = content.find(marker, start)
+            if found != -1 and marker is LYRICS_END_MARKER:
+                return content, False
+            start = max(start, len(content) - len(marker) + 1)
+        return content, True
+
+    async def _download_song_page(self, song_url):
+        """Загружает и разбирает страницу песни.
+
+        Страница читается целиком на любом протоколе: httpcore не сбрасывает
+        поток HTTP/2 при раннем закрытии ответа и не подтверждает пришедшие
+        после этого данные, так что недочитанные страницы исчерпали бы окно
+        управления потоком соединения. Зато разбор начала страницы (до конца
+        блока с текстом) идёт в потоке, пока дочитывается остаток. Если в
+        начале текст не нашёлся, разбирается вся страница - иначе отсутствие
+        текста попало бы в кэш по ошибке.
+        """
+        async with self.client.stream('GET', song_url, timeout=10) as response:
+            response.raise_for_status()
+            body = response.aiter_bytes()
+            with STAGE_SECONDS.time(stage='download'):
+                content, complete = await self._read_until_lyrics_end(body)
+                if not complete:
+                    # Разбор - CPU-задача, уводим её из цикла событий
+                    parse = asyncio.ensure_future(
+                        asyncio.to_thread(self._parse_song_page, bytes(content), song_url)
+                    )
+                    try:
+                        rest = [chunk async for chunk in body]
+                    except BaseException:
+                        parse.cancel()
+                        raise
+
+        with STAGE_SECONDS.time(stage='parse'):
+            if complete:
+                return await asyncio.to_thread(self._parse_song_page, bytes(content), song_url)
+            result, error = await parse
+            if error == NOT_FOUND_LYRICS:
+                content += b''.join(rest)
+                result, error = await asyncio.to_thread(self._parse_song_page, bytes(content), song_url)
+        return result, error
+
+    async def _fetch_lyrics(self, song_url):
+        """Загрузка и разбор страницы песни без кэша"""
+        try:
+            result, error = await self._download_song_page(song_url)
+            self._remember_lyrics(song_url, result, error)
+            return result, error
+
+        except Exception as e:
+            return None, f"Ошибка при извлечении текста: {str(e)}"
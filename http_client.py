@@ -0,0 +1,105 @@
+import importlib.util
+import threading
+
+import httpx
+
+from config import (
+    HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_TIMEOUT, HTTP_HOST_POOLS, HTTP_KEEPALIVE_EXPIRY,
+    HTTP2,
+)
+from rate_limit import ScheduledTransport
+
+
+def _installed(module):
+    return importlib.util.find_spec(module) is not None
+
+
+# Brotli и HTTP/2 включаются, только если установлены нужные пакеты
+BROTLI_AVAILABLE = _installed('brotli') or _installed('brotlicffi')
+HTTP2_AVAILABLE = _installed('h2')
+
+# Заголовки браузера, общие для всех запросов
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate, br' if BROTLI_AVAILABLE else 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Общий асинхронный клиент: один пул соединений на весь процесс
+_client = None
+# Синхронные сессии requests: своя в каждом потоке (Session не потокобезопасна)
+_sessions = threading.local()
+
+
+def parse_host_pools(value):
+    """'host=соединений:keep-alive,...' -> {host: (соединений, keep-alive)}"""
+    pools = {}
+    for item in value.split(','):
+        host, _, sizes = item.strip().partition('=')
+        if host and sizes:
+            connections, _, keepalive = sizes.partition(':')
+            pools[host] = (int(connections), int(keepalive or connections))
+    return pools
+
+
+def _transport(max_connections, max_keepalive, ssl_context):
+    """Транспорт с собственным пулом, обёрнутый планировщиком (лимиты и повторы)"""
+    return ScheduledTransport(httpx.AsyncHTTPTransport(
+        verify=ssl_context,
+        http2=HTTP2 and HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    ))
+
+
+def get_client():
+    """Возвращает общий асинхронный HTTP-клиент, создавая его при первом обращении"""
+    global _client
+    if _client is None or _client.is_closed:
+        # Все запросы проходят через планировщик: лимиты по хостам и повторы.
+        # У нагруженных хостов свой пул, чтобы они не вытесняли остальные.
+        # Контекст TLS общий: загрузка сертификатов - самая долгая часть создания
+        ssl_context = httpx.create_ssl_context(http2=HTTP2 and HTTP2_AVAILABLE)
+        mounts = {
+            f"all://{host}": _transport(connections, keepalive, ssl_context)
+            for host, (connections, keepalive) in parse_host_pools(HTTP_HOST_POOLS).items()
+        }
+        _client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+            transport=_transport(HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, ssl_context),
+            mounts=mounts,
+        )
+    return _client
+
+
+async def close_client():
+    """Закрывает общий клиент и освобождает соединения"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+def sync_session():
+    """Синхронная сессия requests текущего потока с пулом соединений по хостам"""
+    session = getattr(_sessions, 'session', None)
+    if session is None:
+        # requests нужен только синхронному пути - не тратим время на импорт при старте
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=HTTP_MAX_KEEPALIVE, pool_maxsize=HTTP_MAX_KEEPALIVE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _sessions.session = session
+    return session
@@ -0,0 +1,56 @@
+import functools
+
+
+@functools.lru_cache(maxsize=None)
+def _lxml():
+    """Парсер lxml и выражения XPath (загружаются при первом разборе)"""
+    from lxml import etree, html as lxml_html
+
+    # Контейнеры с текстом песни на страницах Genius и заголовок
+    return (
+        lxml_html.fromstring,
+        etree.XPath('//div[@data-lyrics-container="true"]'),
+        etree.XPath('(//h1)[1]'),
+    )
+
+
+def preload():
+    """Загружает lxml заранее, чтобы первый разбор не платил за импорт"""
+    _lxml()
+
+
+def _container_text(container):
+    """Текст контейнера за один обход: <br> - перевод строки, служебные блоки пропускаются"""
+    chunks = []
+
+    def walk(element):
+        tag = element.tag
+        if tag == 'br':
+            chunks.append('\n')
+        elif isinstance(tag, str) and element.get('data-exclude-from-selection') != 'true':
+            if element.text:
+                chunks.append(element.text)
+            for child in element:
+                walk(child)
+                if child.tail:
+                    chunks.append(child.tail)
+
+    walk(container)
+    return ''.join(chunks)
+
+
+def extract_song(content):
+    """Быстрое извлечение (заголовок, текст) со страницы песни через lxml.
+
+    Собирает все контейнеры data-lyrics-container за один проход. Если их на
+    странице нет, вместо текста возвращается None - тогда нужен запасной разбор.
+    """
+    fromstring, lyrics_containers, title_xpath = _lxml()
+    tree = fromstring(content)
+
+    title_elements = title_xpath(tree)
+    title = title_elements[0].text_content().strip() if title_elements else None
+
+    parts = [_container_text(container) for container in lyrics_containers(tree)]
+    lyrics = '\n'.join(part for part in parts if part.strip())
+    return title, lyrics or None
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from cache import LRUCache, SQLiteConnection
+from config import (
+    LYRICS_STORE_PATH, LYRICS_STORE_SIZE, LYRICS_STORE_TTL, WARM_UP_INTERVAL, WARM_UP_LIMIT,
+)
+from rate_limit import background_priority
+from song_index import POPULAR_SONGS, normalize_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def query_key(query):
+    """Ключ запроса: слова без регистра и порядка"""
+    return ' '.join(sorted(normalize_tokens(query)))
+
+
+class LyricsStore:
+    """Готовые ответы: название, строки оригинала, перевод и части сообщения.
+
+    Записи лежат в SQLite (ключ - URL песни) с LRU в памяти. Таблица
+    запросов служит журналом: какой запрос к какой песне привёл и сколько
+    раз его задавали - по ней фоновый прогрев выбирает, что готовить.
+    Таблица results хранит URL песен для id inline-результатов: выбор
+    результата может прийти после перезапуска или в другой процесс.
+    """
+
+    def __init__(self, path=LYRICS_STORE_PATH, maxsize=LYRICS_STORE_SIZE, ttl=LYRICS_STORE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.memory = LRUCache(maxsize)
+        # Без диска журнал запросов живёт в памяти: ключ -> [url, счётчик]
+        self._queries = {}
+        # Без диска и URL inline-результатов тоже: id -> url
+        self._results = LRUCache(10000)
+        self._db = SQLiteConnection(
+            path,
+            'CREATE TABLE IF NOT EXISTS songs ('
+            'url TEXT PRIMARY KEY, title TEXT, lines TEXT, translated TEXT, '
+            'parts TEXT, updated REAL)',
+            'CREATE TABLE IF NOT EXISTS queries ('
+            'query TEXT PRIMARY KEY, url TEXT, count INTEGER, last_seen REAL)',
+            'CREATE TABLE IF NOT EXISTS results (id TEXT PRIMARY KEY, url TEXT)',
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, url):
+        record = self.memory.get(url)
+        if record is None and self.path:
+            with self._lock:
+                row = self._db.get().execute(
+                    'SELECT title, lines, translated, parts, updated FROM songs WHERE url = ?', (url,)
+                ).fetchone()
+            if row is not None:
+                title, lines, translated, parts, updated = row
+                record = {
+                    'url': url,
+                    'title': title,
+                    'lines': json.loads(lines),
+                    'translated': json.loads(translated),
+                    'parts': json.loads(parts),
+                    'updated': updated,
+                }
+                self.memory.set(url, record)
+        return record
+
+    def get(self, url):
+        """Готовая запись песни или None"""
+        record = self._load(url)
+        if record is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return record
+
+    def put(self, record):
+        """Сохраняет запись {url, title, lines, translated, parts}"""
+        record = dict(record, updated=time.time())
+        self.memory.set(record['url'], record)
+        if self.path:
+            with self._lock:
+                db = self._db.get()
+                db.execute(
+                    'INSERT OR REPLACE INTO songs VALUES (?, ?, ?, ?, ?, ?)',
+                    (record['url'], record['title'], json.dumps(record['lines'], ensure_ascii=False),
+                     json.dumps(record['translated'], ensure_ascii=False),
+                     json.dumps(record['parts'], ensure_ascii=False), record['updated']),
+                )
+                db.commit()
+
+    def is_fresh(self, url):
+        """Есть ли запись, которую ещё не пора обновлять"""
+        record = self._load(url)
+        return record is not None and time.time() - record['updated'] < self.ttl
+
+    def url_for(self, query):
+        """URL песни, к которой раньше приводил такой же запрос"""
+        key = query_key(query)
+        if not self.path:
+            entry = self._queries.get(key)
+            return entry[0] if entry else None
+        with self._lock:
+            row = self._db.get().execute('SELECT url FROM queries WHERE query = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def log_query(self, query, url):
+        """Записывает в журнал запрос, который привёл к песне url"""
+        key = query_key(query)
+        if not key:
+            return
+        if not self.path:
+            entry = self._queries.setdefault(key, [url, 0])
+            entry[0] = url
+            entry[1] += 1
+            return
+        with self._lock:
+            db = self._db.get()
+            db.execute(
+                'INSERT INTO queries VALUES (?, ?, 1, ?) ON CONFLICT(query) DO UPDATE SET '
+                'url = excluded.url, count = count + 1, last_seen = excluded.last_seen',
+                (key, url, time.time()),
+            )
+            db.commit()
+
+    def save_result_urls(self, urls):
+        """Запоминает {id inline-результата: URL песни}"""
+        if not urls:
+            return
+        if not self.path:
+            for result_id, url in urls.items():
+                self._results.set(result_id, url)
+            return
+        with self._lock:
+            db = self._db.get()
+            db.executemany('INSERT OR IGNORE INTO results VALUES (?, ?)', list(urls.items()))
+            db.commit()
+
+    def result_url(self, result_id):
+        """URL песни по id inline-результата или None"""
+        if not self.path:
+            return self._results.get(result_id)
+        with self._lock:
+            row = self._db.get().execute('SELECT url FROM results WHERE id = ?', (result_id,)).fetchone()
+        return row[0] if row else None
+
+    def popular_urls(self, limit):
+        """Песни самых частых запросов журнала, популярные первыми"""
+        if not self.path:
+            counts = {}
+            for url, count in self._queries.values():
+                counts[url] = counts.get(url, 0) + count
+            return sorted(counts, key=counts.get, reverse=True)[:limit]
+        with self._lock:
+            rows = self._db.get().execute(
+                'SELECT url FROM queries GROUP BY url ORDER BY SUM(count) DESC LIMIT ?', (limit,)
+            ).fetchall()
+        return [url for url, in rows]
+
+    def preload(self, limit=None):
+        """Загружает в память ответы для самых частых запросов; возвращает их число"""
+        if not self.path:
+            return 0
+        urls = self.popular_urls(limit or self.memory.maxsize)
+        return sum(1 for url in reversed(urls) if self._load(url) is not None)
+
+    def stats(self):
+        """Счётчики попаданий и промахов"""
+        return {'hits': self.hits, 'misses': self.misses, 'memory': self.memory.stats()}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+async def warm_up(store, scraper, prepare, limit=WARM_UP_LIMIT):
+    """Готовит ответы для популярных песен и частых запросов журнала.
+
+    prepare(result) превращает результат скрапера в запись хранилища
+    (None - запись не готова, например не удался перевод). Все запросы
+    идут с фоновым приоритетом и уступают пользователям.
+    Возвращает число подготовленных песен.
+    """
+    urls = [url for _, _, url in POPULAR_SONGS]
+    urls += await asyncio.to_thread(store.popular_urls, limit)
+
+    prepared = 0
+    with background_priority():
+        for url in list(dict.fromkeys(urls))[:limit]:
+            try:
+                if await asyncio.to_thread(store.is_fresh, url):
+                    continue
+                result, error = await scraper.get_lyrics(url)
+                if error or not result:
+                    continue
+                record = await prepare(result)
+                if record is None:
+                    continue
+                await asyncio.to_thread(store.put, record)
+                prepared += 1
+            except Exception as e:
+                logger.warning(f"Прогрев не удался для {url}: {e}")
+    return prepared
+
+
+async def warm_up_forever(store, scraper, prepare, interval=WARM_UP_INTERVAL):
+    """Повторяет прогрев каждые interval секунд"""
+    while True:
+        started = time.monotonic()
+        prepared = await warm_up(store, scraper, prepare)
+        logger.info(f"Прогрев хранилища: подготовлено {prepared} песен за {time.monotonic() - started:.1f} с")
+        await asyncio.sleep(interval)
@@ -0,0 +1,138 @@
+import re
+from html import escape
+
+# Ограничение Telegram на длину сообщения (с запасом), в единицах UTF-16
+MAX_MESSAGE_LENGTH = 4000
+
+BLOCK_SEPARATOR = '\n\n'
+
+# Неделимые куски HTML: тег, сущность или один символ
+_HTML_ATOM = re.compile(r'<[^>]*>|&#?\w+;|.', re.S)
+
+
+def utf16_length(text):
+    """Длина текста так, как её считает Telegram (символы вне BMP - по две единицы)"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def html_text(text):
+    """Текст для сообщения с parse_mode='HTML'"""
+    return escape(text, quote=False)
+
+
+def title_header(title):
+    """Заголовок первой части ответа"""
+    return f"🎵 {html_text(title)}{BLOCK_SEPARATOR}"
+
+
+def line_block(line, translation=None):
+    """Блок строки: оригинал, затем перевод жирным (если он есть и отличается)"""
+    if translation and translation != line:
+        return f"{html_text(line)}\n<b>{html_text(translation)}</b>"
+    return html_text(line)
+
+
+def part_prefix(number):
+    return f"📄 Часть {number}:\n"
+
+
+def split_html(text, limit):
+    """Отрезает от HTML-текста начало длиной не больше limit единиц UTF-16.
+
+    Теги и сущности не разрезаются; теги, открытые на месте разреза,
+    закрываются в начале и открываются заново в остатке.
+    Возвращает (начало, остаток).
+    """
+    head = []
+    length = 0
+    # Открытые теги: (имя, открывающий тег)
+    open_tags = []
+    closing = 0
+    for match in _HTML_ATOM.finditer(text):
+        atom = match.group()
+        # Теги и сущности - ASCII, символ вне BMP занимает две единицы
+        atom_length = len(atom) + (len(atom) == 1 and ord(atom) > 0xFFFF)
+        if atom.startswith('</'):
+            if open_tags:
+                open_tags.pop()
+                closing -= atom_length
+        elif atom.startswith('<') and len(atom) > 1:
+            name = atom[1:-1].split()[0]
+            closing_length = len(name) + 3
+            if length + atom_length + closing + closing_length > limit:
+                break
+            open_tags.append((name, atom))
+            closing += closing_length
+        elif length + atom_length + closing > limit:
+            break
+        head.append(atom)
+        length += atom_length
+    else:
+        return text, ''
+
+    rest = text[match.start():]
+    if not head:
+        return '', rest
+    suffix = ''.join(f"</{name}>" for name, _ in reversed(open_tags))
+    reopen = ''.join(tag for _, tag in open_tags)
+    return ''.join(head) + suffix, reopen + rest
+
+
+class MessageParts:
+    """Инкрементальная разбивка блоков текста на сообщения Telegram.
+
+    Блоки добавляются по мере готовности; последняя часть остаётся открытой,
+    все предыдущие уже не изменятся. Длина каждого блока считается один раз,
+    а части склеиваются из списка кусков только при чтении. Блок длиннее
+    части (например, текст одной строкой) режется по границе части.
+    """
+
+    def __init__(self, header, max_length=MAX_MESSAGE_LENGTH):
+        self.max_length = max_length
+        self._closed = []
+        # Куски открытой части, её длина и есть ли в ней блоки
+        self._pieces = [header]
+        self._length = utf16_length(header)
+        self._has_blocks = False
+
+    def add(self, block):
+        """Добавляет блок; возвращает True, если пришлось начать новую часть"""
+        length = utf16_length(block) + len(BLOCK_SEPARATOR)
+        started = False
+        if self._has_blocks and self._length + length > self.max_length:
+            self._start_part()
+            started = True
+        while self._length + length > self.max_length:
+            # Блок не помещается и в пустую часть: заполняем её началом блока
+            head, block = split_html(block, self.max_length - self._length - len(BLOCK_SEPARATOR))
+            if head:
+                self._append(head, utf16_length(head) + len(BLOCK_SEPARATOR))
+            elif not self._has_blocks and self._closed:
+                raise ValueError(f"max_length={self.max_length} меньше неделимого куска блока")
+            self._start_part()
+            started = True
+            length = utf16_length(block) + len(BLOCK_SEPARATOR)
+        self._append(block, length)
+        return started
+
+    def _start_part(self):
+        self._closed.append(''.join(self._pieces))
+        prefix = part_prefix(len(self._closed) + 1)
+        self._pieces = [prefix]
+        self._length = utf16_length(prefix)
+        self._has_blocks = False
+
+    def _append(self, block, length):
+        self._pieces += (block, BLOCK_SEPARATOR)
+        self._length += length
+        self._has_blocks = True
+
+    def extend(self, blocks):
+        for block in blocks:
+            self.add(block)
+        return self
+
+    @property
+    def parts(self):
+        """Тексты всех частей; закрытые части не склеиваются повторно"""
+        return self._closed + [''.join(self._pieces)]
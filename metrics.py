@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_text(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    """Монотонный счётчик с метками"""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        """{значения меток: счётчик}"""
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for key, value in sorted(self.values().items()):
+            lines.append(f'{self.name}{_label_text(self.labels, key)} {value}')
+        return lines
+
+
+class Histogram:
+    """Гистограмма с метками (совместима с форматом Prometheus)"""
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # значения меток -> [счётчики корзин..., сумма, количество]
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+                    break
+            data[-2] += value
+            data[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Замеряет длительность блока with"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def summary(self):
+        """{значения меток: (количество, среднее, оценка p95)}"""
+        with self._lock:
+            items = [(key, list(data)) for key, data in self._values.items()]
+        result = {}
+        for key, data in items:
+            count = data[-1]
+            if not count:
+                continue
+            p95 = float('inf')
+            seen = 0
+            for bound, bucket in zip(self.buckets, data):
+                seen += bucket
+                if seen >= 0.95 * count:
+                    p95 = bound
+                    break
+            result[key] = (count, data[-2] / count, p95)
+        return result
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, list(data)) for key, data in self._values.items())
+        for key, data in items:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, data):
+                cumulative += bucket
+                lines.append(f'{self.name}_bucket{_label_text(self.labels, key, ("le", bound))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_label_text(self.labels, key, ("le", "+Inf"))} {data[-1]}')
+            lines.append(f'{self.name}_sum{_label_text(self.labels, key)} {data[-2]}')
+            lines.append(f'{self.name}_count{_label_text(self.labels, key)} {data[-1]}')
+        return lines
+
+
+REGISTRY = []
+
+# Длительность стадий обработки запроса
+STAGE_SECONDS = Histogram(
+    'lyrics_stage_seconds', 'Duration of lyrics pipeline stages', labels=('stage',)
+)
+# Итоги стратегий поиска: hit, miss, error, cancelled
+SEARCH_STRATEGY = Counter(
+    'lyrics_search_strategy_total', 'Search strategy outcomes', labels=('strategy', 'result')
+)
+TRANSLATION_BACKEND_SECONDS = Histogram(
+    'translation_backend_seconds', 'Translation backend request latency', labels=('backend',)
+)
+TRANSLATION_BACKEND_ERRORS = Counter(
+    'translation_backend_errors_total', 'Failed translation backend requests', labels=('backend',)
+)
+TRANSLATION_CACHE = Counter(
+    'translation_cache_lines_total', 'Translation cache lookups by unique line', labels=('result',)
+)
+OUTBOUND_RETRIES = Counter(
+    'outbound_retries_total', 'Outbound requests retried after throttling or errors', labels=('host', 'reason')
+)
+REQUESTS = Counter(
+    'bot_requests_total', 'Lyrics requests by outcome', labels=('outcome',)
+)
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+async def _handle_http(reader, writer):
+    """Минимальный HTTP-обработчик: GET /metrics"""
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Заголовки запроса не нужны, но их надо дочитать
+        while (await asyncio.wait_for(reader.readline(), timeout=5)).strip():
+            pass
+        parts = request_line.decode('latin-1').split()
+        if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+            body, status = render().encode(), '200 OK'
+        else:
+            body, status = b'Not Found\n', '404 Not Found'
+        writer.write(
+            f'HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body
+        )
+        await writer.drain()
+    except Exception as e:
+        logger.debug(f"Ошибка HTTP-запроса метрик: {e}")
+    finally:
+        writer.close()
+
+
+async def start_http_server(port, host='0.0.0.0'):
+    """Запускает endpoint /metrics в текущем цикле событий"""
+    server = await asyncio.start_server(_handle_http, host, port)
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,217 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from config import (
+    RATE_LIMITS, RATE_LIMIT_DEFAULT, RETRY_MAX_ATTEMPTS, BACKOFF_BASE, BACKOFF_MAX,
+)
+from metrics import OUTBOUND_RETRIES
+
+# Приоритеты запросов: меньше - важнее
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Приоритет запросов текущей задачи (наследуется дочерними задачами asyncio)
+request_priority = contextvars.ContextVar('request_priority', default=INTERACTIVE)
+
+# Ответы, после которых хост нужно разгрузить
+THROTTLE_STATUSES = {429, 503}
+
+
+@contextmanager
+def background_priority():
+    """Запросы внутри блока уступают интерактивным (прогрев, предзагрузка)"""
+    token = request_priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+def parse_rate(value):
+    """'запросов_в_секунду:всплеск' -> (rate, burst)"""
+    rate, _, burst = value.partition(':')
+    rate = float(rate)
+    return rate, float(burst) if burst else max(1.0, rate)
+
+
+def parse_rate_limits(value):
+    """'host=rate:burst,host2=rate' -> {host: (rate, burst)}"""
+    limits = {}
+    for item in value.split(','):
+        host, _, rate = item.strip().partition('=')
+        if host and rate:
+            limits[host] = parse_rate(rate)
+    return limits
+
+
+def retry_after_seconds(response):
+    """Значение заголовка Retry-After в секундах (None, если его нет)"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Экспоненциальная задержка с джиттером ("full jitter")"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Адаптивное ведро токенов для одного хоста с очередью по приоритетам.
+
+    Скорость снижается вдвое при ответах 429/503 и плавно возвращается к
+    настроенной после успешных запросов (AIMD), поэтому поток держится у
+    максимально допустимого для хоста уровня.
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+        self.blocked_until = 0.0
+        self._waiters = []
+        self._counter = itertools.count()
+        self._timer = None
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    async def acquire(self, priority=INTERACTIVE):
+        """Ждёт токен; более приоритетные запросы обслуживаются первыми"""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        if self._timer is None:
+            self._dispatch()
+        await future
+
+    def _dispatch(self):
+        self._timer = None
+        now = self._refill()
+        while self._waiters and now >= self.blocked_until and self.tokens >= 1:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                # Ожидающий отменён - токен не тратим
+                continue
+            self.tokens -= 1
+            future.set_result(None)
+
+        # Отменённые ожидающие в голове очереди не должны держать таймер
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        if self._waiters and self._timer is None:
+            delay = max(self.blocked_until - now, (1 - self.tokens) / self.rate, 0.001)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def block(self, seconds):
+        """Приостанавливает выдачу токенов (Retry-After, перегрузка)"""
+        self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+
+    def penalize(self):
+        """Снижает скорость после отказа хоста"""
+        self.rate = max(self.max_rate / 16, self.rate / 2)
+
+    def reward(self):
+        """Постепенно возвращает скорость после успешного запроса"""
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class ScheduledTransport(httpx.AsyncBaseTransport):
+    """Транспорт httpx, через который идёт весь исходящий трафик.
+
+    Перед запросом берёт токен из ведра хоста (с учётом приоритета
+    request_priority), на 429/503 соблюдает Retry-After или ждёт
+    экспоненциальную задержку с джиттером и повторяет запрос.
+
+    Таймауты не повторяются: зависший хост и так съел весь таймаут запроса,
+    а вызывающему (например, предохранителю бэкенда перевода) важно узнать
+    об отказе сразу. Остальные повторы укладываются в тот же таймаут.
+    """
+
+    def __init__(self, transport, limits=RATE_LIMITS, default=RATE_LIMIT_DEFAULT,
+                 max_attempts=RETRY_MAX_ATTEMPTS, clock=time.monotonic):
+        self.transport = transport
+        self.limits = parse_rate_limits(limits) if isinstance(limits, str) else dict(limits)
+        self.default = parse_rate(default) if isinstance(default, str) else default
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.buckets = {}
+
+    def bucket(self, host):
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            rate, burst = self.limits.get(host, self.default)
+            bucket = self.buckets[host] = TokenBucket(rate, burst, clock=self.clock)
+        return bucket
+
+    def _deadline(self, request):
+        """Момент, после которого повторять запрос уже поздно (по его таймауту)"""
+        timeouts = [value for value in request.extensions.get('timeout', {}).values() if value is not None]
+        return self.clock() + max(timeouts) if timeouts else None
+
+    async def handle_async_request(self, request):
+        bucket = self.bucket(request.url.host)
+        priority = request_priority.get()
+        deadline = self._deadline(request)
+
+        def can_retry(attempt, delay):
+            if attempt == self.max_attempts - 1:
+                return False
+            return deadline is None or self.clock() + delay < deadline
+
+        for attempt in range(self.max_attempts):
+            await bucket.acquire(priority)
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TimeoutException:
+                raise
+            except httpx.TransportError:
+                delay = backoff_delay(attempt)
+                if not can_retry(attempt, delay) or request.method not in ('GET', 'HEAD'):
+                    raise
+                OUTBOUND_RETRIES.inc(host=request.url.host, reason='transport')
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code not in THROTTLE_STATUSES:
+                bucket.reward()
+                return response
+
+            bucket.penalize()
+            delay = retry_after_seconds(response)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            # Пауза для всего хоста: остальные запросы тоже не лезут в 429
+            delay = min(delay, BACKOFF_MAX)
+            bucket.block(delay)
+            if not can_retry(attempt, delay):
+                return response
+            OUTBOUND_RETRIES.inc(host=request.url.host, reason=str(response.status_code))
+            await response.aclose()
+
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
@@ -0,0 +1,53 @@
+import asyncio
+
+
+class SingleFlight:
+    """Объединяет одновременные вызовы с одинаковым ключом в одну задачу.
+
+    Пока задача по ключу выполняется, новые вызовы не запускают работу
+    заново, а дожидаются её результата (или исключения). Если все
+    ожидающие отменены, общая задача тоже отменяется.
+    """
+
+    def __init__(self):
+        # ключ -> [задача, число ожидающих]
+        self._tasks = {}
+        self.started = 0
+        self.shared = 0
+        self.abandoned = 0
+
+    async def do(self, key, func, *args):
+        entry = self._tasks.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(func(*args))
+            entry = self._tasks[key] = [task, 0]
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.started += 1
+        else:
+            self.shared += 1
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            # shield: отмена одного ожидающего не отменяет общую задачу
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # Ушёл последний ожидающий - результат больше никому не нужен
+            if entry[1] == 1 and not task.done():
+                task.cancel()
+                self.abandoned += 1
+                # Отменённая задача завершится только на следующем шаге цикла -
+                # новые вызовы с этим ключом должны запустить работу заново
+                if self._tasks.get(key) is entry:
+                    del self._tasks[key]
+            raise
+        finally:
+            entry[1] -= 1
+
+    def _forget(self, key, task):
+        entry = self._tasks.get(key)
+        if entry is not None and entry[0] is task:
+            del self._tasks[key]
+
+    def __len__(self):
+        return len(self._tasks)
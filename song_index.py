@@ -0,0 +1,223 @@
+import heapq
+import re
+import threading
+from collections import defaultdict
+
+from cache import SQLiteConnection
+from config import SONG_INDEX_PATH, SONG_INDEX_MIN_SCORE, SONG_INDEX_SIZE
+
+# Популярные песни, которыми индекс наполняется при первом запуске
+POPULAR_SONGS = [
+    ("Queen", "Bohemian Rhapsody", "https://genius.com/Queen-bohemian-rhapsody-lyrics"),
+    ("The Beatles", "Let It Be", "https://genius.com/The-Beatles-let-it-be-lyrics"),
+    ("The Beatles", "Yesterday", "https://genius.com/The-Beatles-yesterday-lyrics"),
+    ("John Lennon", "Imagine", "https://genius.com/John-Lennon-imagine-lyrics"),
+    ("Eagles", "Hotel California", "https://genius.com/Eagles-hotel-california-lyrics"),
+    ("Led Zeppelin", "Stairway to Heaven", "https://genius.com/Led-Zeppelin-stairway-to-heaven-lyrics"),
+    ("Nirvana", "Smells Like Teen Spirit", "https://genius.com/Nirvana-smells-like-teen-spirit-lyrics"),
+    ("Oasis", "Wonderwall", "https://genius.com/Oasis-wonderwall-lyrics"),
+    ("Radiohead", "Creep", "https://genius.com/Radiohead-creep-lyrics"),
+]
+
+# Слова, не влияющие на поиск
+STOP_WORDS = {'the', 'lyrics', 'by', '-', 'feat', 'ft'}
+
+# Доля триграмм более полной стороны, начиная с которой совпадение считается уверенным
+STRONG_COVERAGE = 0.9
+
+
+def normalize_tokens(text):
+    """Слова запроса без регистра, пунктуации и служебных слов"""
+    words = re.sub(r"[^\w\s]", " ", text.lower().replace("'", "")).split()
+    return [word for word in words if word not in STOP_WORDS]
+
+
+def trigrams(tokens):
+    """Множество триграмм слов (с отступами, чтобы учитывать начало слова)"""
+    grams = set()
+    for token in tokens:
+        padded = f"  {token} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def prefix_trigrams(token):
+    """Триграммы недописанного слова: только его начало, без конца слова"""
+    padded = f"  {token}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SongIndex:
+    """Локальный индекс "исполнитель/название -> URL Genius".
+
+    Точный поиск идёт по отсортированному набору слов (порядок исполнителя
+    и названия не важен), нечёткий - по триграммам через инвертированный
+    индекс. Записи хранятся в SQLite и пополняются результатами API;
+    в памяти держится не больше maxsize последних добавленных песен.
+
+    Индекс пополняется из рабочих потоков, поэтому поиск обходит множества
+    триграмм под той же блокировкой. Поиск по большому индексу лучше
+    вызывать вне цикла событий (asyncio.to_thread).
+    """
+
+    def __init__(self, path=SONG_INDEX_PATH, min_score=SONG_INDEX_MIN_SCORE, maxsize=SONG_INDEX_SIZE):
+        self.path = path
+        self.min_score = min_score
+        self.maxsize = maxsize
+        # Память индекса и соединение с SQLite защищены отдельно:
+        # запись на диск не задерживает поиск
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = SQLiteConnection(
+            path, 'CREATE TABLE IF NOT EXISTS songs (url TEXT PRIMARY KEY, artist TEXT, title TEXT)',
+        )
+        self._loaded = False
+        # url -> (исполнитель, название, триграммы)
+        self._songs = {}
+        self._exact = {}
+        self._grams = defaultdict(set)
+
+    def _ensure_loaded(self):
+        """Загружает индекс с диска (один раз)"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            for artist, title, url in POPULAR_SONGS:
+                self._add_to_memory(url, artist, title)
+            if self.path:
+                # Последние добавленные песни (INSERT OR REPLACE обновляет rowid)
+                with self._db_lock:
+                    rows = self._db.get().execute(
+                        'SELECT url, artist, title FROM songs ORDER BY rowid DESC LIMIT ?', (self.maxsize,)
+                    ).fetchall()
+                for url, artist, title in reversed(rows):
+                    self._add_to_memory(url, artist, title)
+            self._loaded = True
+
+    def _add_to_memory(self, url, artist, title):
+        tokens = normalize_tokens(f"{title} {artist or ''}")
+        if not tokens:
+            return
+        if url in self._songs:
+            self._remove_from_memory(url)
+        grams = trigrams(tokens)
+        self._songs[url] = (artist, title, grams)
+        self._exact[' '.join(sorted(tokens))] = url
+        # Название без исполнителя тоже ищется точно, если оно ещё не занято
+        self._exact.setdefault(' '.join(sorted(normalize_tokens(title))), url)
+        for gram in grams:
+            self._grams[gram].add(url)
+        while len(self._songs) > self.maxsize:
+            self._remove_from_memory(next(iter(self._songs)))
+
+    def _remove_from_memory(self, url):
+        """Убирает песню из памяти (на диске она остаётся)"""
+        artist, title, grams = self._songs.pop(url)
+        for key in (' '.join(sorted(normalize_tokens(f"{title} {artist or ''}"))),
+                    ' '.join(sorted(normalize_tokens(title)))):
+            if self._exact.get(key) == url:
+                del self._exact[key]
+        for gram in grams:
+            urls = self._grams[gram]
+            urls.discard(url)
+            if not urls:
+                del self._grams[gram]
+
+    def load(self):
+        """Загружает индекс с диска заранее; возвращает число песен"""
+        return len(self)
+
+    def add(self, url, title, artist=None):
+        """Добавляет песню в индекс и на диск"""
+        self._ensure_loaded()
+        with self._lock:
+            if url in self._songs:
+                return
+            self._add_to_memory(url, artist, title)
+        if self.path:
+            with self._db_lock:
+                db = self._db.get()
+                db.execute('INSERT OR REPLACE INTO songs VALUES (?, ?, ?)', (url, artist, title))
+                db.commit()
+
+    def _shared_grams(self, query_grams):
+        """{url: число общих триграмм} и записи этих песен"""
+        shared = defaultdict(int)
+        with self._lock:
+            for gram in query_grams:
+                for url in self._grams.get(gram, ()):
+                    shared[url] += 1
+            songs = {url: self._songs[url] for url in shared}
+        return shared, songs
+
+    def search(self, query, limit=5):
+        """Список (оценка, url, исполнитель, название), лучшие совпадения первыми"""
+        self._ensure_loaded()
+        tokens = normalize_tokens(query)
+        if not tokens:
+            return []
+        query_grams = trigrams(tokens)
+
+        # Считаем общие триграммы только у песен, с которыми есть пересечение
+        shared, songs = self._shared_grams(query_grams)
+
+        scored = []
+        for url, count in shared.items():
+            artist, title, song_grams = songs[url]
+            query_coverage = count / len(query_grams)
+            song_coverage = count / len(song_grams)
+            # Как подстрока в одну из сторон: одна сторона почти целиком
+            # содержится в другой, а вторая покрыта хотя бы частично
+            if max(query_coverage, song_coverage) < STRONG_COVERAGE:
+                continue
+            if min(query_coverage, song_coverage) < self.min_score:
+                continue
+            scored.append(((query_coverage + song_coverage) / 2, url, artist, title))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored[:limit]
+
+    def suggest(self, query, limit=10):
+        """Подсказки по мере ввода: список (оценка, url, исполнитель, название).
+
+        Последнее слово запроса может быть недописанным, поэтому от него
+        берутся только триграммы начала. Оценка - доля триграмм запроса,
+        найденных у песни; при равенстве выше песни с более коротким названием.
+        """
+        self._ensure_loaded()
+        tokens = normalize_tokens(query)
+        if not tokens:
+            return []
+        query_grams = trigrams(tokens[:-1]) | prefix_trigrams(tokens[-1])
+
+        shared, songs = self._shared_grams(query_grams)
+        candidates = (
+            (count / len(query_grams), -len(songs[url][2]), url)
+            for url, count in shared.items()
+            if count / len(query_grams) >= self.min_score
+        )
+        result = []
+        for score, _, url in heapq.nlargest(limit, candidates):
+            artist, title, _ = songs[url]
+            result.append((score, url, artist, title))
+        return result
+
+    def lookup(self, query):
+        """URL песни по запросу или None"""
+        self._ensure_loaded()
+        url = self._exact.get(' '.join(sorted(normalize_tokens(query))))
+        if url:
+            return url
+        matches = self.search(query, limit=1)
+        return matches[0][1] if matches else None
+
+    def close(self):
+        with self._db_lock:
+            self._db.close()
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._songs)
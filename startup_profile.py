@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Профиль холодного старта бота: импорт модулей и инициализация.
+
+Печатает время первого импорта каждого модуля (собственное и вместе с
+вложенными импортами), сводку по пакетам и шаги инициализации: сборку
+приложения и первые обращения к ленивым компонентам. Бот не запускается
+и к Telegram не обращается.
+
+    python startup_profile.py [--top 25]
+"""
+
+import argparse
+import builtins
+import importlib.util
+import sys
+import time
+from contextlib import contextmanager
+
+
+class ImportProfiler:
+    """Замеряет импорты через builtins.__import__ (только модули, загруженные впервые)"""
+
+    def __init__(self):
+        # модуль -> (вместе с вложенными, собственное время)
+        self.records = {}
+        self._children = []
+        self._original = None
+
+    def install(self):
+        self._original = builtins.__import__
+        builtins.__import__ = self._import
+
+    def uninstall(self):
+        builtins.__import__ = self._original
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        loaded = len(sys.modules)
+        started = time.perf_counter()
+        self._children.append(0.0)
+        try:
+            return self._original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = self._children.pop()
+            if len(sys.modules) > loaded:
+                if level:
+                    package = (globals or {}).get('__package__') or ''
+                    name = importlib.util.resolve_name('.' * level + name, package)
+                self.records.setdefault(name, (elapsed, elapsed - children))
+                if self._children:
+                    self._children[-1] += elapsed
+            elif self._children:
+                # Повторный импорт: время вложенных вызовов всё равно относится к родителю
+                self._children[-1] += children
+
+    def packages(self):
+        """Собственное время импорта, сложенное по пакетам верхнего уровня"""
+        totals = {}
+        for name, (_, own) in self.records.items():
+            package = name.split('.')[0]
+            totals[package] = totals.get(package, 0.0) + own
+        return totals
+
+
+class Stages:
+    """Длительность шагов инициализации"""
+
+    def __init__(self):
+        self.timings = []
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings.append((name, time.perf_counter() - started))
+
+
+def profile():
+    imports = ImportProfiler()
+    stages = Stages()
+    imports.install()
+    try:
+        with stages.stage('.env'):
+            from dotenv import load_dotenv
+            load_dotenv()
+        with stages.stage('import bot'):
+            import bot
+    finally:
+        imports.uninstall()
+
+    # Шаги, которые выполняются при запуске и при первых запросах
+    with stages.stage('build_application'):
+        bot.build_application()
+    with stages.stage('first use: http client'):
+        from http_client import get_client
+        get_client()
+    with stages.stage('first use: song index'):
+        bot.scraper.song_index.load()
+    with stages.stage('first use: lyrics parser'):
+        bot.lyrics_extractor.preload()
+    with stages.stage('first use: translation cache'):
+        bot.translate.translation_cache.preload()
+    with stages.stage('first use: lyrics store'):
+        bot.store.preload()
+    return imports, stages
+
+
+def print_report(imports, stages, top):
+    def ms(seconds):
+        return f"{seconds * 1000:>9.1f}"
+
+    print(f"{'module':<48}{'total, ms':>10}{'own, ms':>10}")
+    ranked = sorted(imports.records.items(), key=lambda item: item[1][0], reverse=True)
+    for name, (total, own) in ranked[:top]:
+        print(f"{name:<48}{ms(total)} {ms(own)}")
+
+    print(f"\n{'package':<48}{'own, ms':>10}")
+    packages = sorted(imports.packages().items(), key=lambda item: item[1], reverse=True)
+    for name, own in packages[:top]:
+        print(f"{name:<48}{ms(own)}")
+
+    print(f"\n{'stage':<48}{'ms':>10}")
+    for name, elapsed in stages.timings:
+        print(f"{name:<48}{ms(elapsed)}")
+    print(f"{'total':<48}{ms(sum(elapsed for _, elapsed in stages.timings))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--top', type=int, default=25, help='сколько самых медленных модулей показать')
+    args = parser.parse_args()
+
+    imports, stages = profile()
+    print_report(imports, stages, args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+from cache import TTLCache
+
+
+def test_entries_expire_after_ttl():
+    now = [0.0]
+    cache = TTLCache(maxsize=10, ttl=60, clock=lambda: now[0])
+    cache.set('song', 'lyrics')
+
+    now[0] = 59
+    assert cache.get('song') == 'lyrics'
+    now[0] = 61
+    assert cache.get('song') is None
+    assert len(cache) == 0
+
+
+def test_short_ttl_for_negative_results():
+    now = [0.0]
+    cache = TTLCache(maxsize=10, ttl=3600, clock=lambda: now[0])
+    cache.set('found', 'lyrics')
+    cache.set('missing', None, ttl=120)
+
+    now[0] = 121
+    assert cache.get('missing', 'expired') == 'expired'
+    assert cache.get('found') == 'lyrics'
+
+
+def test_byte_budget_evicts_least_recently_used():
+    cache = TTLCache(maxsize=100, ttl=60, max_bytes=10, weigher=len)
+    cache.set('a', 'xxxx')
+    cache.set('b', 'xxxx')
+    cache.get('a')
+    cache.set('c', 'xxxx')
+
+    # Вытеснена давно не читанная запись, вес остальных в пределах бюджета
+    assert cache.get('b') is None
+    assert cache.get('a') == 'xxxx' and cache.get('c') == 'xxxx'
+    assert cache.bytes == 8
+    assert cache.stats()['evictions'] == 1
+
+    cache.set('a', 'x')
+    assert cache.bytes == 5
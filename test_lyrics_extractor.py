@@ -0,0 +1,140 @@
+import asyncio
+import os
+
+import httpx
+
+from genius_scraper import AsyncGeniusScraper, GeniusScraper
+from lyrics_extractor import extract_song
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'fixtures')
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+def test_extract_song_collects_all_containers():
+    title, lyrics = extract_song(read_fixture('song_containers.html'))
+
+    assert title == "Amazing Grace"
+    # Служебный заголовок внутри контейнера не попадает в текст
+    assert "Amazing Grace Lyrics" not in lyrics
+    # Строки разделены переводами строк, второй контейнер тоже собран
+    assert "Amazing grace! How sweet the sound\nThat saved a wretch like me!" in lyrics
+    assert "Than when we'd first begun." in lyrics
+
+
+def test_extract_song_without_containers():
+    title, lyrics = extract_song(read_fixture('song_legacy.html'))
+
+    assert title == "Amazing Grace"
+    assert lyrics is None
+
+
+def test_parse_song_page_falls_back_to_heuristics():
+    result, error = GeniusScraper()._parse_song_page(read_fixture('song_legacy.html'), 'https://genius.com/x')
+
+    assert error is None
+    assert "Amazing grace" in result['lyrics']
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    """Тело ответа, которое приходит маленькими кусками"""
+
+    def __init__(self, content, size=100):
+        self.chunks = [content[i:i + size] for i in range(0, len(content), size)]
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def test_song_page_download_ignores_marker_outside_lyrics():
+    page = read_fixture('song_containers.html')
+    heads = [
+        # Имя класса подвала в стилях раньше контейнеров с текстом
+        b'<head><style>.LyricsFooter__Container{margin:0}</style>',
+        # Оба маркера в скрипте раньше контейнеров: начала страницы мало
+        b'<head><script>var s = "data-lyrics-container LyricsFooter__";</script>',
+    ]
+
+    async def download(content):
+        scraper = AsyncGeniusScraper(httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, stream=ChunkedStream(content))
+        )))
+        return await scraper.get_lyrics('https://genius.com/x-lyrics')
+
+    for head in heads:
+        result, error = asyncio.run(download(page.replace(b'<head>', head, 1)))
+        assert error is None
+        assert "Than when we'd first begun." in result['lyrics']
+
+
+async def serve_h2(page):
+    """Минимальный сервер HTTP/2 без TLS, который отдаёт page с учётом окна потока"""
+    import h2.config
+    import h2.connection
+    import h2.events
+
+    connections = []
+
+    async def handle(reader, writer):
+        conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False))
+        conn.initiate_connection()
+        writer.write(conn.data_to_send())
+        window_updated = asyncio.Event()
+        connections.append(conn)
+
+        async def respond(stream_id):
+            conn.send_headers(stream_id, [(':status', '200'), ('content-length', str(len(page)))])
+            sent = 0
+            while sent < len(page):
+                size = min(conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size,
+                           len(page) - sent)
+                if size <= 0:
+                    window_updated.clear()
+                    await window_updated.wait()
+                    continue
+                conn.send_data(stream_id, page[sent:sent + size])
+                sent += size
+                writer.write(conn.data_to_send())
+                await writer.drain()
+            conn.end_stream(stream_id)
+            writer.write(conn.data_to_send())
+
+        while data := await reader.read(65536):
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    asyncio.ensure_future(respond(event.stream_id))
+                elif isinstance(event, h2.events.WindowUpdated):
+                    window_updated.set()
+            writer.write(conn.data_to_send())
+        writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    return server, connections
+
+
+def test_repeated_song_downloads_over_one_http2_connection():
+    # Хвост страницы после текста; вместе страницы больше окна соединения (16 МБ)
+    page = read_fixture('song_containers.html') + b'<!--' + b'x' * (2 * 1024 * 1024) + b'-->'
+
+    async def scenario():
+        server, connections = await serve_h2(page)
+        port = server.sockets[0].getsockname()[1]
+        async with httpx.AsyncClient(http1=False, http2=True) as client:
+            scraper = AsyncGeniusScraper(client)
+            results = []
+            for i in range(12):
+                results.append(await asyncio.wait_for(
+                    scraper._fetch_lyrics(f'http://127.0.0.1:{port}/song-{i}-lyrics'), 5
+                ))
+        server.close()
+        return results, len(connections)
+
+    results, connections = asyncio.run(scenario())
+    assert connections == 1
+    for result, error in results:
+        assert error is None
+        assert "Than when we'd first begun." in result['lyrics']
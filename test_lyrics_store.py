@@ -0,0 +1,13 @@
+from lyrics_store import LyricsStore
+
+
+def test_inline_result_urls_survive_restart(tmp_path):
+    path = str(tmp_path / 'lyrics.sqlite3')
+    store = LyricsStore(path=path)
+    store.save_result_urls({'#abc': 'https://genius.com/very-long-lyrics'})
+    store.close()
+
+    # Выбор результата может прийти уже в новый процесс
+    restarted = LyricsStore(path=path)
+    assert restarted.result_url('#abc') == 'https://genius.com/very-long-lyrics'
+    assert restarted.result_url('#missing') is None
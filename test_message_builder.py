@@ -0,0 +1,42 @@
+import re
+
+from message_builder import MessageParts, line_block, title_header, utf16_length
+
+
+def test_parts_respect_utf16_limit():
+    # Каждый эмодзи - две единицы UTF-16
+    blocks = ["🎶" * 10] * 30
+    parts = MessageParts(title_header("Song"), max_length=100).extend(blocks).parts
+
+    assert len(parts) > 1
+    assert all(utf16_length(part) <= 100 for part in parts)
+    assert parts[1].startswith("📄 Часть 2:\n")
+    assert sum(part.count("🎶" * 10) for part in parts) == 30
+
+
+def test_blocks_are_html_escaped():
+    assert title_header("Rock & Roll") == "🎵 Rock &amp; Roll\n\n"
+    assert line_block("<3 you", "люблю & жду") == "&lt;3 you\n<b>люблю &amp; жду</b>"
+    assert line_block("same", "same") == "same"
+
+
+def test_long_block_is_split_at_part_limit():
+    parts = MessageParts("header\n\n", max_length=40).extend(["x" * 50, "y"]).parts
+
+    # Заголовок не остаётся один: начало блока дописывается к нему
+    assert parts[0] == "header\n\n" + "x" * 30 + "\n\n"
+    assert parts[1] == "📄 Часть 2:\n" + "x" * 20 + "\n\ny\n\n"
+
+
+def test_split_keeps_entities_and_tags_whole():
+    block = line_block("rock & roll " * 300, "рок-н-ролл " * 300)
+    parts = MessageParts(title_header("Song"), max_length=500).extend([block]).parts
+
+    assert len(parts) > 2
+    for part in parts:
+        assert utf16_length(part) <= 500
+        assert part.count("<b>") == part.count("</b>")
+        assert not re.search(r"&(?!amp;)", part)
+    # Без префиксов частей и тегов получается исходный текст целиком
+    text = "".join(re.sub(r"📄 Часть \d+:\n|</?b>|\n\n$", "", part) for part in parts)
+    assert text == title_header("Song") + re.sub(r"</?b>", "", block)
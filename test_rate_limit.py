@@ -0,0 +1,129 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import httpx
+import pytest
+
+import rate_limit
+from rate_limit import BACKGROUND, INTERACTIVE, ScheduledTransport, TokenBucket, retry_after_seconds
+
+
+class StubTransport(httpx.AsyncBaseTransport):
+    """Транспорт, который по очереди отдаёт заготовленные ответы или исключения"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def handle_async_request(self, request):
+        outcome = self.outcomes[min(self.calls, len(self.outcomes) - 1)]
+        self.calls += 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        if isinstance(outcome, httpx.Response):
+            return outcome
+        return httpx.Response(outcome, headers={'Retry-After': '0'})
+
+
+def send(transport, method='GET', timeout=5):
+    request = httpx.Request(method, 'https://example.com/', extensions={
+        'timeout': {'connect': timeout, 'read': timeout, 'write': timeout, 'pool': timeout},
+    })
+    return asyncio.run(transport.handle_async_request(request))
+
+
+def scheduled(*outcomes, now=None):
+    stub = StubTransport(*outcomes)
+    clock = (lambda: now[0]) if now else time.monotonic
+    return stub, ScheduledTransport(stub, limits={}, default=(1000, 1000), max_attempts=3, clock=clock)
+
+
+def test_interactive_requests_go_first():
+    now = [0.0]
+    bucket = TokenBucket(rate=128, burst=1, clock=lambda: now[0])
+    order = []
+
+    async def request(name, priority):
+        await bucket.acquire(priority)
+        order.append(name)
+
+    async def scenario():
+        await bucket.acquire()
+        tasks = [
+            asyncio.ensure_future(request('background 1', BACKGROUND)),
+            asyncio.ensure_future(request('background 2', BACKGROUND)),
+            asyncio.ensure_future(request('interactive', INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        # Время идёт только по часам ведра: по одному токену за шаг
+        # (шаг - двоичная дробь, чтобы токены считались без погрешности)
+        for _ in tasks:
+            now[0] += 1 / 128
+            await asyncio.sleep(0.03)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert order == ['interactive', 'background 1', 'background 2']
+
+
+def test_retry_after_seconds_and_http_date():
+    assert retry_after_seconds(httpx.Response(429, headers={'Retry-After': '7'})) == 7
+    assert retry_after_seconds(httpx.Response(429)) is None
+
+    date = formatdate(time.time() + 60, usegmt=True)
+    delay = retry_after_seconds(httpx.Response(503, headers={'Retry-After': date}))
+    assert 58 <= delay <= 60
+
+
+def test_rate_halves_on_throttling_and_recovers():
+    bucket = TokenBucket(rate=10, burst=10)
+    bucket.penalize()
+    bucket.penalize()
+    assert bucket.rate == 2.5
+
+    for _ in range(100):
+        bucket.reward()
+    assert bucket.rate == 10
+
+
+def test_throttled_request_is_retried_then_returned(monkeypatch):
+    monkeypatch.setattr(rate_limit, 'backoff_delay', lambda attempt: 0)
+
+    stub, transport = scheduled(429, 200)
+    assert send(transport).status_code == 200
+    assert stub.calls == 2
+    # Успешный ответ уже начал возвращать скорость после снижения
+    assert 500 < transport.bucket('example.com').rate < 1000
+
+    # На последней попытке возвращается сам ответ 503
+    stub, transport = scheduled(503)
+    assert send(transport).status_code == 503
+    assert stub.calls == 3
+
+
+def test_connection_errors_retried_but_timeouts_are_not(monkeypatch):
+    monkeypatch.setattr(rate_limit, 'backoff_delay', lambda attempt: 0)
+
+    stub, transport = scheduled(httpx.ConnectError('refused'), 200)
+    assert send(transport).status_code == 200
+    assert stub.calls == 2
+
+    stub, transport = scheduled(httpx.ConnectError('refused'))
+    with pytest.raises(httpx.ConnectError):
+        send(transport, method='POST')
+    assert stub.calls == 1
+
+    # Зависший хост уже съел весь таймаут: повтор только утроил бы ожидание
+    stub, transport = scheduled(httpx.ReadTimeout('hung'))
+    with pytest.raises(httpx.ReadTimeout):
+        send(transport)
+    assert stub.calls == 1
+
+
+def test_retry_does_not_outlive_request_timeout():
+    stub, transport = scheduled(httpx.Response(429, headers={'Retry-After': '20'}), now=[0.0])
+
+    # Ждать 20 секунд ради повтора запроса с таймаутом 5 секунд бессмысленно
+    assert send(transport, timeout=5).status_code == 429
+    assert stub.calls == 1
@@ -0,0 +1,59 @@
+import asyncio
+
+from singleflight import SingleFlight
+
+
+def test_shared_task_survives_one_cancelled_waiter():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return 42
+
+        first = asyncio.ensure_future(flights.do('key', work))
+        second = asyncio.ensure_future(flights.do('key', work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second, flights.started, flights.abandoned
+
+    assert asyncio.run(scenario()) == (42, 1, 0)
+
+
+def test_shared_task_is_cancelled_when_all_waiters_leave():
+    async def scenario():
+        flights = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiter = asyncio.ensure_future(flights.do('key', work))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return len(flights), flights.abandoned
+
+    assert asyncio.run(scenario()) == (0, 1)
+
+
+def test_call_right_after_abandon_starts_new_task():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            return 42
+
+        waiter = asyncio.ensure_future(flights.do('key', work))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        # Отменённая задача ещё не завершилась, а новый вызов уже пришёл
+        return await flights.do('key', work), flights.started, flights.abandoned
+
+    assert asyncio.run(scenario()) == (42, 2, 1)
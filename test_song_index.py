@@ -0,0 +1,60 @@
+import threading
+
+from song_index import POPULAR_SONGS, SongIndex
+
+
+def test_lookup_ignores_word_order_and_case():
+    index = SongIndex(path='')
+
+    assert index.lookup("Queen Bohemian Rhapsody") == "https://genius.com/Queen-bohemian-rhapsody-lyrics"
+    assert index.lookup("bohemian rhapsody") == "https://genius.com/Queen-bohemian-rhapsody-lyrics"
+
+
+def test_fuzzy_lookup_tolerates_typos_but_not_other_songs():
+    index = SongIndex(path='')
+
+    assert index.lookup("wonderwal oasis") == "https://genius.com/Oasis-wonderwall-lyrics"
+    assert index.lookup("imagine dragons believer") is None
+
+
+def test_added_songs_are_persisted(tmp_path):
+    path = str(tmp_path / 'songs.sqlite3')
+    SongIndex(path=path).add("https://genius.com/Adele-hello-lyrics", "Hello", "Adele")
+
+    assert SongIndex(path=path).lookup("adele hello") == "https://genius.com/Adele-hello-lyrics"
+
+
+def test_suggest_matches_unfinished_last_word():
+    index = SongIndex(path='')
+
+    suggestions = index.suggest("smells like te")
+    assert suggestions[0][1] == "https://genius.com/Nirvana-smells-like-teen-spirit-lyrics"
+    assert index.suggest("zzzz") == []
+
+
+def test_memory_keeps_latest_songs():
+    index = SongIndex(path='', maxsize=12)
+    for i in range(20):
+        index.add(f"https://genius.com/song-{i}", f"Track{i}", "Band")
+
+    assert len(index) == 12
+    assert index.lookup("band track19") == "https://genius.com/song-19"
+    assert index.lookup("band track0") is None
+
+
+def test_search_while_songs_are_added_from_thread():
+    index = SongIndex(path='')
+    index.load()
+
+    def add_songs():
+        for i in range(3000):
+            index.add(f"https://genius.com/song-{i}", f"Song number {i}", "Band")
+
+    writer = threading.Thread(target=add_songs)
+    writer.start()
+    while writer.is_alive():
+        index.suggest("song numb")
+        index.search("band song number")
+    writer.join()
+
+    assert len(index) == 3000 + len(POPULAR_SONGS)
@@ -0,0 +1,57 @@
+import asyncio
+
+import translate
+from translate_backends import BackendRouter, CircuitBreaker, StubBackend
+from translation_cache import TranslationCache
+
+
+def use_backends(monkeypatch, *backends):
+    monkeypatch.setattr(translate, 'router', BackendRouter(backends))
+    monkeypatch.setattr(translate, 'translation_cache', TranslationCache(path=''))
+
+
+def test_batch_packs_lines_and_skips_repeats(monkeypatch):
+    stub = StubBackend()
+    use_backends(monkeypatch, stub)
+
+    lines = ["hello there", "", "general kenobi", "hello there"] * 10
+    result = translate.translate_batch(lines)
+
+    assert result[:4] == ["[ru] hello there", "", "[ru] general kenobi", "[ru] hello there"]
+    assert stub.calls == 1
+    # Повторный перевод берётся из кэша
+    translate.translate_batch(lines)
+    assert stub.calls == 1
+
+
+def test_failing_backend_is_skipped_after_circuit_opens(monkeypatch):
+    broken, spare = StubBackend(fail=True), StubBackend()
+    use_backends(monkeypatch, broken, spare)
+
+    for i in range(10):
+        assert translate.translate_text(f"line {i}") == f"[ru] line {i}"
+
+    assert broken.breaker.state == 'open'
+    assert broken.calls == broken.breaker.failure_threshold
+
+
+def test_async_batch_matches_sync(monkeypatch):
+    use_backends(monkeypatch, StubBackend())
+
+    result = asyncio.run(translate.translate_batch_async(["one line", "two lines"]))
+
+    assert result == ["[ru] one line", "[ru] two lines"]
+
+
+def test_circuit_breaker_half_open_probe():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    now[0] = 11
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
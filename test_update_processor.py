@@ -0,0 +1,77 @@
+import asyncio
+from types import SimpleNamespace
+
+from update_processor import FairUpdateProcessor
+
+
+def chat_update(chat_id, text='query'):
+    return SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id), text=text)
+
+
+def run(processor, updates, handler):
+    """Обрабатывает обновления одновременно; handler(update) - корутина обработчика"""
+    async def scenario():
+        await processor.initialize()
+        tasks = []
+        for update in updates:
+            tasks.append(asyncio.ensure_future(processor.do_process_update(update, handler(update))))
+            # Обновления приходят по одному, как из очереди приложения
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+
+def test_one_update_per_chat_at_a_time():
+    processor = FairUpdateProcessor(max_concurrent_updates=16, workers=4, per_user=1)
+    running = {}
+    peak = {}
+
+    async def handler(update):
+        chat = update.effective_chat.id
+        running[chat] = running.get(chat, 0) + 1
+        peak[chat] = max(peak.get(chat, 0), running[chat])
+        peak['all'] = max(peak.get('all', 0), sum(running.values()))
+        await asyncio.sleep(0.01)
+        running[chat] -= 1
+
+    run(processor, [chat_update(1), chat_update(1), chat_update(2), chat_update(2)], handler)
+
+    # Внутри чата по одному, но разные чаты не ждут друг друга
+    assert peak == {1: 1, 2: 1, 'all': 2}
+    # Чаты без обновлений в работе не копятся
+    assert processor.active_users == 0
+
+
+def test_updates_over_chat_queue_limit_are_dropped():
+    processor = FairUpdateProcessor(max_concurrent_updates=16, workers=4, per_user=1, per_user_queue=2)
+    handled = []
+
+    async def handler(update):
+        await asyncio.sleep(0.01)
+        handled.append(update.text)
+
+    run(processor, [chat_update(1, str(i)) for i in range(4)] + [chat_update(2, 'other')], handler)
+
+    assert handled == ['0', 'other', '1']
+    assert processor.dropped == 2
+
+
+def test_new_query_supersedes_running_and_waiting_ones():
+    processor = FairUpdateProcessor(
+        max_concurrent_updates=16, workers=4, per_user=1,
+        supersedes=lambda update: update.text != '/stats',
+    )
+    handled = []
+
+    async def handler(update):
+        await asyncio.sleep(0.01)
+        handled.append(update.text)
+
+    updates = [chat_update(1, 'first'), chat_update(1, 'second'), chat_update(1, '/stats'), chat_update(1, 'third')]
+    run(processor, updates, handler)
+
+    # first отменён во время работы, second - пока ждал очереди;
+    # /stats ничего не вытесняет и выполняется как обычно
+    assert handled == ['/stats', 'third']
+    assert processor.superseded == 2
@@ -1,79 +1,193 @@
-import requests
-import time
-import json
-
-# Альтернативные API для перевода
-TRANSLATE_APIS = [
-    {
-        "url": "https://translate.googleapis.com/translate_a/single",
-        "params": {
-            "client": "gtx",
-            "sl": "en",
-            "tl": "ru",
-            "dt": "t"
-        },
-        "method": "GET"
-    },
-    {
-        "url": "https://api.mymemory.translated.net/get",
-        "params": {
-            "q": "",
-            "langpair": "en|ru"
-        },
-        "method": "GET"
-    }
-]
+import asyncio
+
+from config import TRANSLATE_CONCURRENCY
+from http_client import get_client
+from singleflight import SingleFlight
+from translate_backends import BackendRouter
+from translation_cache import TranslationCache
+
+# Память переводов, общая для всех запросов процесса
+translation_cache = TranslationCache()
+
+# Одновременные переводы одинаковых пакетов строк выполняются один раз
+translation_flights = SingleFlight()
+
+# Backend'ы перевода с учётом их здоровья
+router = BackendRouter.from_names()
+
+# Разделитель строк в пакетном запросе: API сохраняют переводы строк
+BATCH_DELIMITER = "\n"
 
 def translate_text(text, target_lang="ru", source_lang="en"):
     """Переводит текст с помощью различных API"""
     if not text or len(text.strip()) == 0:
         return ""
-    
+
     # Очищаем текст от лишних символов
     text = text.strip()
-    
-    for api in TRANSLATE_APIS:
-        try:
-            if api["method"] == "GET":
-                params = api["params"].copy()
-                if "q" in params:
-                    params["q"] = text
-                else:
-                    params["q"] = text
-                
-                response = requests.get(
-                    api["url"],
-                    params=params,
-                    timeout=5
-                )
-            else:
-                data = api["params"].copy()
-                data["q"] = text
-                
-                response = requests.post(
-                    api["url"],
-                    data=data,
-                    timeout=5
-                )
-            
-            if response.status_code == 200:
-                try:
-                    if "googleapis" in api["url"]:
-                        # Google Translate API
-                        result = response.json()
-                        if result and len(result) > 0 and len(result[0]) > 0:
-                            translated = "".join([part[0] for part in result[0] if part[0]])
-                            return translated
-                    elif "mymemory" in api["url"]:
-                        # MyMemory API
-                        result = response.json()
-                        if "responseData" in result and "translatedText" in result["responseData"]:
-                            return result["responseData"]["translatedText"]
-                except (json.JSONDecodeError, KeyError, IndexError):
-                    continue
-                    
-        except Exception:
-            continue
-    
+
+    cached = translation_cache.get_many([text], source_lang, target_lang)
+    if text in cached:
+        return cached[text]
+
+    for backend in router.ordered():
+        translated = backend.translate(text, target_lang, source_lang)
+        if translated is not None:
+            translation_cache.set_many({text: translated}, source_lang, target_lang)
+            return translated
+
+    # Если все API не сработали, возвращаем оригинальный текст
+    return text
+
+async def translate_text_async(text, target_lang="ru", source_lang="en", client=None):
+    """Асинхронный вариант translate_text на общем пуле соединений"""
+    if not text or len(text.strip()) == 0:
+        return ""
+
+    text = text.strip()
+
+    cached = await asyncio.to_thread(translation_cache.get_many, [text], source_lang, target_lang)
+    if text in cached:
+        return cached[text]
+
+    for backend in router.ordered():
+        translated = await backend.translate_async(text, target_lang, source_lang, client)
+        if translated is not None:
+            await asyncio.to_thread(translation_cache.set_many, {text: translated}, source_lang, target_lang)
+            return translated
+
     # Если все API не сработали, возвращаем оригинальный текст
-    return text 
\ No newline at end of file
+    return text
+
+def _normalize_line(line):
+    """Строка без внутренних переводов строк, чтобы не сломать разделитель"""
+    return " ".join(line.split())
+
+def _chunk_indices(indices, texts, max_bytes):
+    """Группирует строки в пакеты, укладывающиеся в лимит API"""
+    chunks, current, size = [], [], 0
+    for i in indices:
+        line_size = len(texts[i].encode("utf-8")) + len(BATCH_DELIMITER)
+        if current and size + line_size > max_bytes:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(i)
+        size += line_size
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _split_translation(translated, count):
+    """Разбивает перевод пакета обратно на строки (None, если число строк не совпало)"""
+    if translated is None:
+        return None
+    parts = [part.strip() for part in translated.strip().split(BATCH_DELIMITER)]
+    if len(parts) != count:
+        return None
+    return parts
+
+def _request_chunk(backend, chunk, target_lang, source_lang):
+    """Переводит пакет строк одним запросом; при рассогласовании делит пакет пополам"""
+    translated = backend.translate(BATCH_DELIMITER.join(chunk), target_lang, source_lang)
+    parts = _split_translation(translated, len(chunk))
+
+    if parts is None and translated is not None and len(chunk) > 1:
+        middle = len(chunk) // 2
+        left = _request_chunk(backend, chunk[:middle], target_lang, source_lang)
+        right = _request_chunk(backend, chunk[middle:], target_lang, source_lang)
+        if left is None or right is None:
+            return None
+        return left + right
+    return parts
+
+async def _request_chunk_async(backend, chunk, target_lang, source_lang, client):
+    """Асинхронный вариант _request_chunk"""
+    translated = await backend.translate_async(BATCH_DELIMITER.join(chunk), target_lang, source_lang, client)
+    parts = _split_translation(translated, len(chunk))
+
+    if parts is None and translated is not None and len(chunk) > 1:
+        middle = len(chunk) // 2
+        left, right = await asyncio.gather(
+            _request_chunk_async(backend, chunk[:middle], target_lang, source_lang, client),
+            _request_chunk_async(backend, chunk[middle:], target_lang, source_lang, client),
+        )
+        if left is None or right is None:
+            return None
+        return left + right
+    return parts
+
+def translate_batch(lines, target_lang="ru", source_lang="en"):
+    """Переводит список строк минимальным числом запросов.
+
+    Повторяющиеся строки и строки из кэша переводов в запросы не попадают.
+    Остальные упаковываются в пакеты под лимит каждого backend'а; пакеты,
+    которые не удалось перевести, передаются следующему по здоровью backend'у. Возвращает список той
+    же длины: пустые строки остаются пустыми, непереведённые - оригиналом.
+    """
+    texts = [_normalize_line(line) if line else "" for line in lines]
+    unique = [text for text in dict.fromkeys(texts) if text]
+    translations = translation_cache.get_many(unique, source_lang, target_lang)
+    missing = [text for text in unique if text not in translations]
+
+    fresh = {}
+    pending = list(range(len(missing)))
+    for backend in router.ordered():
+        if not pending:
+            break
+        failed = []
+        for chunk in _chunk_indices(pending, missing, backend.max_bytes):
+            parts = _request_chunk(backend, [missing[i] for i in chunk], target_lang, source_lang)
+            if parts is None:
+                failed.extend(chunk)
+                continue
+            for i, part in zip(chunk, parts):
+                if part:
+                    fresh[missing[i]] = part
+        pending = failed
+
+    translation_cache.set_many(fresh, source_lang, target_lang)
+    translations.update(fresh)
+    return [translations.get(text, text) for text in texts]
+
+async def translate_batch_async(lines, target_lang="ru", source_lang="en", client=None):
+    """Асинхронный вариант translate_batch: пакеты отправляются параллельно.
+
+    Одновременные вызовы с одинаковыми строками разделяют один перевод.
+    """
+    key = (source_lang, target_lang, tuple(lines))
+    return list(await translation_flights.do(
+        key, _translate_batch_async, lines, target_lang, source_lang, client
+    ))
+
+async def _translate_batch_async(lines, target_lang, source_lang, client):
+    client = client or get_client()
+    texts = [_normalize_line(line) if line else "" for line in lines]
+    unique = [text for text in dict.fromkeys(texts) if text]
+    translations = await asyncio.to_thread(translation_cache.get_many, unique, source_lang, target_lang)
+    missing = [text for text in unique if text not in translations]
+    semaphore = asyncio.Semaphore(TRANSLATE_CONCURRENCY)
+
+    async def request(backend, chunk):
+        async with semaphore:
+            return await _request_chunk_async(backend, [missing[i] for i in chunk], target_lang, source_lang, client)
+
+    fresh = {}
+    pending = list(range(len(missing)))
+    for backend in router.ordered():
+        if not pending:
+            break
+        chunks = _chunk_indices(pending, missing, backend.max_bytes)
+        outcomes = await asyncio.gather(*(request(backend, chunk) for chunk in chunks))
+        failed = []
+        for chunk, parts in zip(chunks, outcomes):
+            if parts is None:
+                failed.extend(chunk)
+                continue
+            for i, part in zip(chunk, parts):
+                if part:
+                    fresh[missing[i]] = part
+        pending = failed
+
+    await asyncio.to_thread(translation_cache.set_many, fresh, source_lang, target_lang)
+    translations.update(fresh)
+    return [translations.get(text, text) for text in texts]
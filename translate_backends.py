@@ -0,0 +1,308 @@
+import asyncio
+import threading
+import time
+
+from config import (
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, TRANSLATE_BACKENDS,
+    TRANSLATE_PRIORITY_PENALTY,
+)
+from http_client import get_client, sync_session
+from metrics import TRANSLATION_BACKEND_ERRORS, TRANSLATION_BACKEND_SECONDS
+
+
+class CircuitBreaker:
+    """Автомат защиты: после серии ошибок backend временно исключается.
+
+    closed - запросы идут; open - запросы не идут reset_timeout секунд;
+    half_open - пропускается один пробный запрос, его итог решает, закрыться
+    или снова открыться.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def available(self):
+        """Можно ли сейчас направить запрос (не меняет состояние)"""
+        if self.state == 'closed':
+            return True
+        if self.state == 'open':
+            return self.clock() - self.opened_at >= self.reset_timeout
+        return not self._probing
+
+    def allow(self):
+        """Резервирует право на запрос"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._probing = False
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self):
+        """Возвращает неиспользованное право на пробный запрос"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = self.clock()
+            self._probing = False
+
+
+class BackendHealth:
+    """Скользящие оценки задержки и доли ошибок backend'а"""
+
+    # Вес нового измерения в экспоненциальном среднем
+    ALPHA = 0.2
+
+    def __init__(self):
+        self.latency = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, latency, ok):
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+        self.latency = latency if self.latency is None else (
+            self.ALPHA * latency + (1 - self.ALPHA) * self.latency
+        )
+        self.error_rate = self.ALPHA * (0.0 if ok else 1.0) + (1 - self.ALPHA) * self.error_rate
+
+
+class TranslationBackend:
+    """Базовый backend перевода.
+
+    Наследники описывают запрос (build_request) и разбор ответа
+    (parse_response); учёт здоровья и автомат защиты общие.
+    """
+
+    name = 'base'
+    # Максимальный размер текста в одном запросе (байт UTF-8)
+    max_bytes = 500
+    timeout = 5
+
+    def __init__(self):
+        self.health = BackendHealth()
+        self.breaker = CircuitBreaker()
+
+    @property
+    def session(self):
+        """Синхронная сессия requests текущего потока (общий пул соединений)"""
+        return sync_session()
+
+    def build_request(self, text, target_lang, source_lang):
+        """Возвращает (метод, url, параметры)"""
+        raise NotImplementedError
+
+    def parse_response(self, data):
+        """Перевод из JSON-ответа или None"""
+        raise NotImplementedError
+
+    def _record(self, started, translated):
+        ok = translated is not None
+        latency = time.monotonic() - started
+        self.health.record(latency, ok)
+        TRANSLATION_BACKEND_SECONDS.observe(latency, backend=self.name)
+        if ok:
+            self.breaker.record_success()
+        else:
+            TRANSLATION_BACKEND_ERRORS.inc(backend=self.name)
+            self.breaker.record_failure()
+
+    def translate(self, text, target_lang="ru", source_lang="en"):
+        """Переводит текст; None, если backend не справился"""
+        if not self.breaker.allow():
+            return None
+        started = time.monotonic()
+        translated = None
+        try:
+            method, url, params = self.build_request(text, target_lang, source_lang)
+            if method == "GET":
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            else:
+                response = self.session.post(url, data=params, timeout=self.timeout)
+            if response.status_code == 200:
+                translated = self.parse_response(response.json())
+        except Exception:
+            translated = None
+        self._record(started, translated)
+        return translated
+
+    async def translate_async(self, text, target_lang="ru", source_lang="en", client=None):
+        """Асинхронный вариант translate на общем пуле соединений"""
+        if not self.breaker.allow():
+            return None
+        started = time.monotonic()
+        translated = None
+        try:
+            client = client or get_client()
+            method, url, params = self.build_request(text, target_lang, source_lang)
+            if method == "GET":
+                response = await client.get(url, params=params, timeout=self.timeout)
+            else:
+                response = await client.post(url, data=params, timeout=self.timeout)
+            if response.status_code == 200:
+                translated = self.parse_response(response.json())
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception:
+            translated = None
+        self._record(started, translated)
+        return translated
+
+
+class GoogleBackend(TranslationBackend):
+    """Неофициальный endpoint Google Translate (client=gtx)"""
+
+    name = 'google'
+    max_bytes = 4000
+
+    def build_request(self, text, target_lang, source_lang):
+        return "GET", "https://translate.googleapis.com/translate_a/single", {
+            "client": "gtx",
+            "sl": source_lang,
+            "tl": target_lang,
+            "dt": "t",
+            "q": text,
+        }
+
+    def parse_response(self, data):
+        if data and len(data) > 0 and data[0]:
+            return "".join([part[0] for part in data[0] if part[0]])
+        return None
+
+
+class MyMemoryBackend(TranslationBackend):
+    """Бесплатный API MyMemory"""
+
+    name = 'mymemory'
+    max_bytes = 500
+
+    def build_request(self, text, target_lang, source_lang):
+        return "GET", "https://api.mymemory.translated.net/get", {
+            "q": text,
+            "langpair": f"{source_lang}|{target_lang}",
+        }
+
+    def parse_response(self, data):
+        if "responseData" in data and "translatedText" in data["responseData"]:
+            return data["responseData"]["translatedText"]
+        return None
+
+
+class StubBackend(TranslationBackend):
+    """Локальный backend для тестов и бенчмарков: без сети.
+
+    Переводом считается текст с префиксом языка; задержку и отказы можно
+    настроить.
+    """
+
+    name = 'stub'
+    max_bytes = 4000
+
+    def __init__(self, latency=0.0, fail=False):
+        super().__init__()
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+
+    def _stub(self, text, target_lang):
+        self.calls += 1
+        if self.fail:
+            return None
+        return "\n".join(f"[{target_lang}] {line}" for line in text.split("\n"))
+
+    def translate(self, text, target_lang="ru", source_lang="en"):
+        if not self.breaker.allow():
+            return None
+        started = time.monotonic()
+        if self.latency:
+            time.sleep(self.latency)
+        translated = self._stub(text, target_lang)
+        self._record(started, translated)
+        return translated
+
+    async def translate_async(self, text, target_lang="ru", source_lang="en", client=None):
+        if not self.breaker.allow():
+            return None
+        started = time.monotonic()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        translated = self._stub(text, target_lang)
+        self._record(started, translated)
+        return translated
+
+
+BACKENDS = {
+    'google': GoogleBackend,
+    'mymemory': MyMemoryBackend,
+    'stub': StubBackend,
+}
+
+
+class BackendRouter:
+    """Выбор backend'ов по измеренному здоровью.
+
+    Backend'ы с открытым автоматом пропускаются; остальные сортируются по
+    задержке с поправкой на долю ошибок. Штраф за позицию в списке сохраняет
+    приоритет основного backend'а, пока он не заметно хуже запасных.
+    """
+
+    def __init__(self, backends):
+        self.backends = list(backends)
+
+    @classmethod
+    def from_names(cls, names=TRANSLATE_BACKENDS):
+        return cls(BACKENDS[name.strip()]() for name in names.split(',') if name.strip())
+
+    def _score(self, position, backend):
+        health = backend.health
+        latency = health.latency or 0.0
+        return latency * (1 + 10 * health.error_rate) + position * TRANSLATE_PRIORITY_PENALTY
+
+    def ordered(self):
+        """Доступные backend'ы, лучшие первыми"""
+        candidates = [
+            (self._score(position, backend), position, backend)
+            for position, backend in enumerate(self.backends)
+            if backend.breaker.available()
+        ]
+        candidates.sort(key=lambda item: (item[0], item[1]))
+        return [backend for _, _, backend in candidates]
+
+    def stats(self):
+        """Задержка, ошибки и состояние автомата по каждому backend'у"""
+        return {
+            backend.name: {
+                'latency': backend.health.latency,
+                'error_rate': backend.health.error_rate,
+                'requests': backend.health.requests,
+                'errors': backend.health.errors,
+                'circuit': backend.breaker.state,
+            }
+            for backend in self.backends
+        }
@@ -0,0 +1,105 @@
+import threading
+
+from cache import LRUCache, SQLiteConnection
+from config import TRANSLATION_CACHE_PATH, TRANSLATION_CACHE_SIZE
+from metrics import TRANSLATION_CACHE
+
+
+class TranslationCache:
+    """Память переводов: LRU в процессе поверх SQLite на диске.
+
+    Ключ - (source_lang, target_lang, строка). SQLite-файл переживает
+    перезапуски и может использоваться несколькими процессами сразу.
+    Пустой путь отключает диск и оставляет только LRU.
+    """
+
+    def __init__(self, path=TRANSLATION_CACHE_PATH, maxsize=TRANSLATION_CACHE_SIZE):
+        self.path = path
+        self.memory = LRUCache(maxsize)
+        self._db = SQLiteConnection(
+            path,
+            'CREATE TABLE IF NOT EXISTS translations ('
+            'source_lang TEXT, target_lang TEXT, line TEXT, translation TEXT, '
+            'PRIMARY KEY (source_lang, target_lang, line))',
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, lines, source_lang="en", target_lang="ru"):
+        """Возвращает {строка: перевод} для строк, найденных в кэше"""
+        unique = list(dict.fromkeys(lines))
+        found = {}
+        missing = []
+        for line in unique:
+            translation = self.memory.get((source_lang, target_lang, line))
+            if translation is not None:
+                found[line] = translation
+            else:
+                missing.append(line)
+
+        if missing and self.path:
+            with self._lock:
+                db = self._db.get()
+                # Ограничение SQLite на число параметров запроса
+                for start in range(0, len(missing), 500):
+                    part = missing[start:start + 500]
+                    placeholders = ','.join('?' * len(part))
+                    rows = db.execute(
+                        'SELECT line, translation FROM translations '
+                        f'WHERE source_lang = ? AND target_lang = ? AND line IN ({placeholders})',
+                        [source_lang, target_lang, *part],
+                    ).fetchall()
+                    for line, translation in rows:
+                        found[line] = translation
+                        self.memory.set((source_lang, target_lang, line), translation)
+
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        TRANSLATION_CACHE.inc(len(found), result='hit')
+        TRANSLATION_CACHE.inc(len(unique) - len(found), result='miss')
+        return found
+
+    def set_many(self, translations, source_lang="en", target_lang="ru"):
+        """Сохраняет {строка: перевод} в память и на диск"""
+        if not translations:
+            return
+        for line, translation in translations.items():
+            self.memory.set((source_lang, target_lang, line), translation)
+
+        if self.path:
+            with self._lock:
+                db = self._db.get()
+                db.executemany(
+                    'INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)',
+                    [(source_lang, target_lang, line, translation)
+                     for line, translation in translations.items()],
+                )
+                db.commit()
+
+    def preload(self, limit=None):
+        """Загружает в память последние сохранённые переводы; возвращает их число"""
+        if not self.path:
+            return 0
+        with self._lock:
+            rows = self._db.get().execute(
+                'SELECT source_lang, target_lang, line, translation FROM translations '
+                'ORDER BY rowid DESC LIMIT ?',
+                (limit or self.memory.maxsize,),
+            ).fetchall()
+        # Самые свежие добавляются последними и дольше остаются в LRU
+        for source_lang, target_lang, line, translation in reversed(rows):
+            self.memory.set((source_lang, target_lang, line), translation)
+        return len(rows)
+
+    def stats(self):
+        """Счётчики попаданий и промахов"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'memory': self.memory.stats(),
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
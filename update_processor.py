@@ -0,0 +1,133 @@
+import asyncio
+
+from telegram.ext import BaseUpdateProcessor
+
+
+def update_owner(update):
+    """Ключ пользователя для ограничения параллелизма (чат, иначе отправитель)"""
+    # Inline-запросы приходят на каждое нажатие клавиши: очередной не должен
+    # ждать предыдущий, устаревшие запросы бот отбрасывает сам
+    if getattr(update, 'inline_query', None) is not None:
+        return None
+    chat = getattr(update, 'effective_chat', None)
+    if chat is not None:
+        return chat.id
+    user = getattr(update, 'effective_user', None)
+    if user is not None:
+        return user.id
+    return None
+
+
+class _UserJobs:
+    """Очередь обновлений одного чата"""
+
+    def __init__(self, per_user):
+        self.semaphore = asyncio.Semaphore(per_user)
+        # Ожидающие и выполняющиеся обновления
+        self.pending = 0
+        # Номер последнего вытесняющего обновления
+        self.generation = 0
+        # Выполняющиеся вытесняемые задачи
+        self.running = set()
+
+
+class FairUpdateProcessor(BaseUpdateProcessor):
+    """Обработчик обновлений с пулом воркеров и лимитом на пользователя.
+
+    max_concurrent_updates ограничивает очередь принятых обновлений,
+    workers - сколько из них выполняется одновременно, per_user - сколько
+    одновременно выполняется у одного чата. Обновление сначала ждёт своей
+    очереди внутри чата и только потом занимает воркер, поэтому активный
+    пользователь не блокирует воркеры остальных.
+
+    supersedes(update) отмечает обновления, которые вытесняют предыдущие
+    такие же в этом чате (новый поисковый запрос): старые отменяются, если
+    уже выполняются, и пропускаются, если ещё ждут. В очереди одного чата
+    ждёт не больше per_user_queue остальных обновлений.
+    """
+
+    def __init__(self, max_concurrent_updates, workers, per_user=1, per_user_queue=None,
+                 supersedes=None):
+        super().__init__(max_concurrent_updates)
+        self.workers = workers
+        self.per_user = per_user
+        self.per_user_queue = per_user_queue
+        self.supersedes = supersedes
+        self._worker_slots = None
+        # ключ пользователя -> _UserJobs
+        self._users = {}
+        self.superseded = 0
+        self.dropped = 0
+
+    async def initialize(self):
+        self._worker_slots = asyncio.Semaphore(self.workers)
+
+    async def shutdown(self):
+        self._users.clear()
+
+    async def do_process_update(self, update, coroutine):
+        key = update_owner(update)
+        if key is None:
+            async with self._worker_slots:
+                await coroutine
+            return
+
+        jobs = self._users.get(key)
+        if jobs is None:
+            jobs = self._users[key] = _UserJobs(self.per_user)
+        supersedes = self.supersedes is not None and self.supersedes(update)
+        if not supersedes and self.per_user_queue and jobs.pending >= self.per_user_queue:
+            # Чат засыпал бота обновлениями - лишние не обрабатываем
+            coroutine.close()
+            self.dropped += 1
+            return
+
+        generation = None
+        if supersedes:
+            jobs.generation += 1
+            generation = jobs.generation
+            for task in jobs.running:
+                task.cancel()
+
+        jobs.pending += 1
+        try:
+            async with jobs.semaphore:
+                # Устаревший запрос не должен занимать и ждать воркер
+                if generation is not None and generation != jobs.generation:
+                    coroutine.close()
+                    self.superseded += 1
+                    return
+                async with self._worker_slots:
+                    if generation is None:
+                        await coroutine
+                    else:
+                        await self._run_superseded(jobs, generation, coroutine)
+        finally:
+            jobs.pending -= 1
+            if jobs.pending == 0:
+                self._users.pop(key, None)
+
+    async def _run_superseded(self, jobs, generation, coroutine):
+        """Выполняет вытесняемое обновление, если за ним не пришло более новое"""
+        # Более новый запрос мог прийти, пока ждали воркер
+        if generation != jobs.generation:
+            coroutine.close()
+            self.superseded += 1
+            return
+
+        task = asyncio.ensure_future(coroutine)
+        jobs.running.add(task)
+        try:
+            await task
+        except asyncio.CancelledError:
+            if generation == jobs.generation:
+                raise
+            # Отменено более новым запросом этого чата
+            self.superseded += 1
+        finally:
+            jobs.running.discard(task)
+
+    @property
+    def active_users(self):
+        """Число пользователей с обновлениями в работе или в очереди"""
+        return len(self._users)